@@ -0,0 +1,183 @@
+"""
+ASGI application serving Django views.
+
+Django 2.0 views and ORM are synchronous, so every request is handled (middleware, view and its
+database queries) in a bounded pool of threads, `ASGI_THREADS`. Request and response bodies are
+read and written on the event loop, so a slow client only holds a coroutine, not a thread and its
+database connection.
+
+Streaming responses (exports, long lists) are produced piece by piece in a thread of their own,
+because a server-side cursor must stay on the connection of the thread that opened it. At most
+`ASGI_STREAMS` of them run at once, and they don't take threads of the pool.
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.handlers.wsgi import WSGIHandler, get_script_name
+from django.db import close_old_connections, connections
+from django.urls import set_script_prefix
+
+
+class ASGIHandler(WSGIHandler):
+    # Pieces of a streaming response are joined up to this size, instead of sending each one
+    stream_chunk_size = 64 * 1024
+
+    def __init__(self, threads, streams):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(threads)
+        self.streams = streams
+        self._stream_semaphore = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type {}'.format(scope['type']))
+
+        body = await self.read_body(receive)
+        if body is None:
+            # Client disconnected before sending whole request
+            return
+
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(self.executor, self.handle, self.build_environ(scope, body))
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': self.response_headers(response),
+        })
+        if response.streaming:
+            await self.send_streaming_body(response, send)
+        else:
+            await send({'type': 'http.response.body', 'body': response.content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                return body.getvalue()
+
+    def build_environ(self, scope, body):
+        """
+        WSGI environ of an ASGI HTTP request
+        """
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI strings are bytes decoded as latin-1
+            'PATH_INFO': scope['path'].encode().decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_{}'.format(name)
+            environ[name] = '{},{}'.format(environ[name], value) if name in environ else value
+
+        # Whole body is read already, also when it was sent in chunks without a length
+        environ['CONTENT_LENGTH'] = str(len(body))
+        return environ
+
+    def handle(self, environ):
+        """
+        Handle request in a thread of the pool, the same way as `WSGIHandler`. Response of a
+        non-streaming response is closed here, so connections of this thread are closed or kept
+        according to `CONN_MAX_AGE` when request finishes.
+        """
+        set_script_prefix(get_script_name(environ))
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        request = self.request_class(environ)
+        response = self.get_response(request)
+        response._handler_class = self.__class__
+
+        if response.streaming:
+            # Body is read in another thread, which has its own connections
+            close_old_connections()
+        else:
+            response.close()
+
+        return response
+
+    def response_headers(self, response):
+        headers = list(response.items())
+        for cookie in response.cookies.values():
+            headers.append(('Set-Cookie', cookie.output(header='')))
+        return [(name.encode('latin-1'), str(value).encode('latin-1')) for name, value in headers]
+
+    def _read_stream_chunk(self, content):
+        pieces = []
+        size = 0
+        for piece in content:
+            pieces.append(piece)
+            size += len(piece)
+            if size >= self.stream_chunk_size:
+                break
+        return b''.join(pieces)
+
+    def _close_stream(self, response):
+        response.close()
+        # Thread is thrown away with the stream, so are its connections
+        connections.close_all()
+
+    async def send_streaming_body(self, response, send):
+        if self._stream_semaphore is None:
+            self._stream_semaphore = asyncio.Semaphore(self.streams)
+
+        loop = asyncio.get_event_loop()
+        async with self._stream_semaphore:
+            stream_executor = ThreadPoolExecutor(1)
+            content = iter(response)
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(stream_executor, self._read_stream_chunk, content)
+                    if not chunk:
+                        break
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                await loop.run_in_executor(stream_executor, self._close_stream, response)
+                stream_executor.shutdown(wait=False)
+
+
+def get_asgi_application():
+    """
+    Set up Django and return ASGI application, like `django.core.wsgi.get_wsgi_application`
+    """
+    django.setup(set_prefix=False)
+    return ASGIHandler(settings.ASGI_THREADS, settings.ASGI_STREAMS)
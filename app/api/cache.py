@@ -0,0 +1,136 @@
+"""
+Responses are cached under a namespace version, which is the time of the last change to anything
+in that namespace. Changing data sets a new version, so every cached response of the namespace is
+outdated at once without having to find and delete them.
+
+Cache backend is configured by `CACHES` setting. With more than one server process, use a shared
+backend (e.g. memcached), otherwise each process only sees invalidation done by itself until
+`API_CACHE_TIMEOUT` expires.
+"""
+import hashlib
+import time
+from functools import update_wrapper
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+
+def _get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def _version_key(namespace):
+    return 'api:{namespace}:version'.format(namespace=namespace)
+
+
+def get_namespace_version(namespace):
+    cache = _get_cache()
+    version_key = _version_key(namespace)
+
+    version = cache.get(version_key)
+    if version is None:
+        version = time.time()
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def _set_namespace_version(namespace):
+    _get_cache().set(_version_key(namespace), time.time(), None)
+
+
+def invalidate_namespace(namespace):
+    """
+    Outdate all cached responses in `namespace`. It's done again after current transaction is
+    committed, in case another request has cached data that was about to change in the meantime.
+    """
+    _set_namespace_version(namespace)
+    transaction.on_commit(lambda: _set_namespace_version(namespace))
+
+
+def objects_cache_namespace(model_uuid):
+    """
+    Cache namespace of responses computed from objects of a risk model, outdated by any change to
+    them, whether by the API or by management commands
+    """
+    return 'risk_objects:{}'.format(model_uuid)
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses and answer conditional requests (`If-None-Match`,
+    `If-Modified-Since`) with 304. A cached response is returned without touching database.
+    """
+    cache_namespace = None
+
+    def get_cache_namespace(self):
+        return self.cache_namespace
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """
+        GET is run outside of `ATOMIC_REQUESTS` transaction, so a cached response doesn't even
+        open a database connection. Other methods are still run in a transaction as configured.
+        """
+        view = super().as_view(**initkwargs)
+
+        def view_func(request, *args, **kwargs):
+            if request.method == 'GET' or not connection.settings_dict['ATOMIC_REQUESTS']:
+                return view(request, *args, **kwargs)
+
+            with transaction.atomic():
+                return view(request, *args, **kwargs)
+
+        update_wrapper(view_func, view)
+        return transaction.non_atomic_requests(view_func)
+
+    def _get_response_cache_key(self, request, version):
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return 'api:{namespace}:{version}:{url}'.format(
+            namespace=self.get_cache_namespace(), version=version, url=url_hash)
+
+    def _is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+    def _set_cache_headers(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Let clients keep the response, but always check with us before using it
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def get(self, request, *args, **kwargs):
+        version = get_namespace_version(self.get_cache_namespace())
+        cache_key = self._get_response_cache_key(request, version)
+
+        cached = _get_cache().get(cache_key)
+        if cached is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+
+            cached = {
+                'content': response.content,
+                'headers': {header: response[header]
+                            for header in ('Content-Type', 'Allow') if response.has_header(header)},
+                'etag': '"{}"'.format(hashlib.md5(response.content).hexdigest()),
+            }
+            _get_cache().set(cache_key, cached, settings.API_CACHE_TIMEOUT)
+
+        if self._is_not_modified(request, cached['etag'], version):
+            return self._set_cache_headers(HttpResponseNotModified(), cached['etag'], version)
+
+        response = HttpResponse(cached['content'])
+        for header, value in cached['headers'].items():
+            response[header] = value
+
+        return self._set_cache_headers(response, cached['etag'], version)
@@ -0,0 +1,62 @@
+import atexit
+import logging
+import sqlite3
+import weakref
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Database wrappers of every thread, `PRAGMA optimize` is run on connections still open at exit
+_sqlite_connections = weakref.WeakSet()
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Run `SQLITE_PRAGMAS` on every new SQLite connection, receiver of `connection_created`.
+    Other databases are left alone.
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    # Straight on the new connection, so pragmas aren't counted as queries of the request opening it
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute('PRAGMA {name} = {value}'.format(name=name, value=value))
+
+    if settings.SQLITE_OPTIMIZE_ON_EXIT:
+        _sqlite_connections.add(connection)
+
+
+def query_param_batches(items, connection, reserved=0):
+    """
+    Split `items` into lists small enough to be bound, with `reserved` other parameters, in one
+    query on `connection`. SQLite builds before 3.32 allow at most 999 parameters per query
+    (`features.max_query_params`), databases without a limit get all items at once.
+    """
+    items = list(items)
+    max_params = connection.features.max_query_params
+    if not max_params:
+        if items:
+            yield items
+        return
+
+    batch_size = max(max_params - reserved, 1)
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+@atexit.register
+def optimize_sqlite_connections():
+    """
+    Let SQLite update statistics of tables whose queries would benefit from them before process
+    exits. Mostly does nothing, and is cheap when it doesn't.
+    """
+    for connection in list(_sqlite_connections):
+        if connection.connection is None:
+            continue
+        try:
+            connection.connection.execute('PRAGMA optimize')
+        except sqlite3.Error:
+            # Database is busy or connection was closed, statistics can wait for next time
+            logger.debug('PRAGMA optimize skipped', exc_info=True)
@@ -1,9 +1,33 @@
+import datetime
+import decimal
+import uuid
+
 from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
 from django.db.models.base import ModelBase
 
 
+# Types that `DjangoJSONEncoder` knows how to encode
+_DJANGO_JSON_TYPES = frozenset([datetime.datetime, datetime.date, datetime.time, datetime.timedelta, decimal.Decimal])
+
+
 class ModelJSONEncoder(DjangoJSONEncoder):
     def default(self, obj):
+        # Check the most common types directly rather than trying `iter(obj)` first,
+        # which raises (and catches) TypeError for every one of them
+        obj_type = type(obj)
+        if obj_type is uuid.UUID:
+            return str(obj)
+
+        if obj_type in _DJANGO_JSON_TYPES:
+            return super().default(obj)
+
+        if isinstance(obj_type, ModelBase):
+            return obj.to_dict()
+
+        if isinstance(obj, QuerySet):
+            return list(obj)
+
         try:
             iterable = iter(obj)
         except TypeError:
@@ -11,7 +35,41 @@ class ModelJSONEncoder(DjangoJSONEncoder):
         else:
             return list(iterable)
 
-        if isinstance(obj.__class__, ModelBase):
-            return obj.to_dict()
-
         return super().default(obj)
+
+
+def iterencode_chunked(obj, cls=ModelJSONEncoder, chunk_size=100):
+    """
+    Encode `obj` piece by piece, output is identical to `json.dumps(obj, cls=cls)`.
+
+    Lists are encoded `chunk_size` items at a time, and each item is encoded at once by C encoder,
+    which is much faster than `JSONEncoder.iterencode` that falls back to pure Python.
+    """
+    encoder = cls()
+    yield from _iterencode(encoder, obj, chunk_size)
+
+
+def _iterencode(encoder, obj, chunk_size):
+    if isinstance(obj, dict) and all(isinstance(key, str) for key in obj):
+        yield '{'
+        for index, (key, value) in enumerate(obj.items()):
+            yield '{separator}{key}: '.format(separator=', ' if index else '', key=encoder.encode(key))
+            yield from _iterencode(encoder, value, chunk_size)
+        yield '}'
+
+    elif isinstance(obj, (list, tuple, QuerySet)):
+        yield '['
+        chunk = []
+        is_first_chunk = True
+        for item in obj:
+            chunk.append(encoder.encode(item))
+            if len(chunk) == chunk_size:
+                yield ('' if is_first_chunk else ', ') + ', '.join(chunk)
+                chunk = []
+                is_first_chunk = False
+        if chunk:
+            yield ('' if is_first_chunk else ', ') + ', '.join(chunk)
+        yield ']'
+
+    else:
+        yield encoder.encode(obj)
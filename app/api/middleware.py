@@ -0,0 +1,126 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+
+logger = logging.getLogger('app.api.timing')
+
+
+class RequestTiming:
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.timings = {}
+
+    def add(self, name, elapsed):
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    # Used with `connection.execute_wrapper`
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+
+@contextmanager
+def timing(request, name):
+    """
+    Add time spent in this block to `name` metric of request, e.g. `serialize`. Does nothing if
+    request isn't sampled by `RequestTimingMiddleware`.
+    """
+    request_timing = getattr(request, '_timing', None)
+    if request_timing is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_timing.add(name, time.perf_counter() - start)
+
+
+class RequestTimingMiddleware:
+    """
+    Measure total time, database queries and time, serialization time and response size of a
+    sample of requests (`REQUEST_TIMING_SAMPLE_RATE`, 0 to 1). Measurements are sent back in
+    `Server-Timing` header and logged as JSON to `app.api.timing` logger.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        request_timing = RequestTiming()
+        request._timing = request_timing
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(request_timing))
+            response = self.get_response(request)
+        total_time = time.perf_counter() - start
+
+        metrics = [
+            ('total', total_time, None),
+            ('db', request_timing.db_time, '{} queries'.format(request_timing.db_queries)),
+        ] + [(name, elapsed, None) for name, elapsed in sorted(request_timing.timings.items())]
+
+        response['Server-Timing'] = ', '.join(
+            '{name};dur={duration:.1f}{desc}'.format(
+                name=name, duration=elapsed * 1000, desc=';desc="{}"'.format(desc) if desc else '')
+            for name, elapsed, desc in metrics)
+
+        log_data = {
+            'url_name': self._get_url_name(request),
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total_time * 1000, 2),
+            'db_ms': round(request_timing.db_time * 1000, 2),
+            'db_queries': request_timing.db_queries,
+            'response_bytes': None if response.streaming else len(response.content),
+        }
+        log_data.update(('{}_ms'.format(name), round(elapsed * 1000, 2))
+                        for name, elapsed in request_timing.timings.items())
+        logger.info(json.dumps(log_data))
+
+        return response
+
+    def _get_url_name(self, request):
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None:
+            try:
+                resolver_match = resolve(request.path_info)
+            except Resolver404:
+                return None
+        return resolver_match.view_name
+
+
+class ConnectionHealthCheckMiddleware:
+    """
+    Close a persistent database connection (`CONN_MAX_AGE`) that no longer works before the
+    request uses it, e.g. after database restarted or dropped idle connections. Django then opens
+    a new one on first query. Enabled per database by `CONN_HEALTH_CHECKS`.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for connection in connections.all():
+            if connection.settings_dict.get('CONN_HEALTH_CHECKS') and connection.connection is not None \
+                    and not connection.in_atomic_block and not connection.is_usable():
+                connection.close()
+
+        return self.get_response(request)
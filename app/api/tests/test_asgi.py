@@ -0,0 +1,76 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from app.api.asgi import ASGIHandler
+
+
+def _request(application, method, path, query_string=b'', body=b'', headers=()):
+    """
+    Run an HTTP request through ASGI `application`, return status, headers and body of response
+    """
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver')] + list(headers),
+        'http_version': '1.1',
+        'scheme': 'http',
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 12345),
+    }
+    request_messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response_messages = []
+
+    async def receive():
+        return request_messages.pop(0)
+
+    async def send(message):
+        response_messages.append(message)
+
+    asyncio.get_event_loop().run_until_complete(application(scope, receive, send))
+
+    start = response_messages[0]
+    assert start['type'] == 'http.response.start'
+    assert all(message['type'] == 'http.response.body' for message in response_messages[1:])
+    assert not response_messages[-1].get('more_body')
+    return start['status'], dict(start['headers']), b''.join(message['body'] for message in response_messages[1:])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_asgi_requests():
+    """
+    Test ASGI application handles reads and writes in threads, and streams long responses in chunks
+    """
+    application = ASGIHandler(threads=2, streams=2)
+    application.stream_chunk_size = 100
+
+    status, headers, body = _request(application, 'POST', reverse('risk_api:model-list'), body=json.dumps({
+        'name': 'Car',
+        'fields': [{'name': 'Brand', 'type': 'text'}],
+    }).encode(), headers=[(b'content-type', b'application/json')])
+    assert status == 201
+    risk_model = json.loads(body.decode())
+
+    status, headers, body = _request(
+        application, 'GET', reverse('risk_api:model-list'), query_string=b'limit=1')
+    assert status == 200
+    assert headers[b'Content-Type'] == b'application/json'
+    assert json.loads(body.decode())['results'][0]['uuid'] == risk_model['uuid']
+
+    list_url = reverse('risk_api:object-list', args=[risk_model['uuid']])
+    for brand in ['Toyota', 'Volvo', 'Honda']:
+        Client().post(list_url, json.dumps({'brand': brand}), content_type='application/json')
+
+    status, headers, body = _request(
+        application, 'GET', reverse('risk_api:object-export', args=[risk_model['uuid']]))
+    assert status == 200
+    assert sorted(json.loads(line)['brand'] for line in body.decode().splitlines()) == ['Honda', 'Toyota', 'Volvo']
+
+    status, headers, body = _request(application, 'GET', reverse('risk_api:model-detail', args=[str(uuid.uuid4())]))
+    assert status == 404
@@ -0,0 +1,82 @@
+import sqlite3
+from unittest import mock
+
+import pytest
+from django.db import connections
+
+from app.api import db
+
+
+def _new_sqlite_connection(tmpdir):
+    settings_dict = dict(connections['default'].settings_dict, NAME=str(tmpdir.join('pragmas.db')))
+    return connections['default'].__class__(settings_dict, alias='pragmas')
+
+
+def _pragma(sqlite_connection, name):
+    with sqlite_connection.cursor() as cursor:
+        cursor.execute('PRAGMA {}'.format(name))
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas(tmpdir, settings):
+    """
+    Test SQLITE_PRAGMAS are run on a new SQLite connection
+    """
+    settings.SQLITE_PRAGMAS = {
+        'busy_timeout': 1234,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -4000,
+        'mmap_size': 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+    sqlite_connection = _new_sqlite_connection(tmpdir)
+    try:
+        assert _pragma(sqlite_connection, 'busy_timeout') == 1234
+        assert _pragma(sqlite_connection, 'journal_mode') == 'wal'
+        assert _pragma(sqlite_connection, 'synchronous') == 1
+        assert _pragma(sqlite_connection, 'cache_size') == -4000
+        assert _pragma(sqlite_connection, 'mmap_size') == 1024 * 1024
+        assert _pragma(sqlite_connection, 'temp_store') == 2
+    finally:
+        sqlite_connection.close()
+
+
+@pytest.mark.django_db
+def test_sqlite_optimize_on_exit(tmpdir, settings):
+    """
+    Test open connections are optimized at exit, closed ones are skipped and errors are ignored
+    """
+    settings.SQLITE_OPTIMIZE_ON_EXIT = True
+
+    open_connection, closed_connection, busy_connection = [_new_sqlite_connection(tmpdir) for _ in range(3)]
+    for sqlite_connection in (open_connection, closed_connection, busy_connection):
+        sqlite_connection.ensure_connection()
+        assert sqlite_connection in db._sqlite_connections
+
+    # Calls to the underlying sqlite3 connections are recorded
+    open_connection.connection = mock.Mock(wraps=open_connection.connection)
+    closed_connection.connection = closed_raw_connection = mock.Mock(wraps=closed_connection.connection)
+    busy_connection.connection = mock.Mock(wraps=busy_connection.connection, **{
+        'execute.side_effect': sqlite3.OperationalError('database is locked')})
+    closed_connection.close()
+
+    try:
+        db.optimize_sqlite_connections()
+
+        open_connection.connection.execute.assert_called_once_with('PRAGMA optimize')
+        busy_connection.connection.execute.assert_called_once_with('PRAGMA optimize')
+        closed_raw_connection.execute.assert_not_called()
+    finally:
+        open_connection.close()
+        busy_connection.close()
+
+    settings.SQLITE_OPTIMIZE_ON_EXIT = False
+    skipped_connection = _new_sqlite_connection(tmpdir)
+    skipped_connection.ensure_connection()
+    try:
+        assert skipped_connection not in db._sqlite_connections
+    finally:
+        skipped_connection.close()
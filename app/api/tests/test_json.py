@@ -0,0 +1,43 @@
+import datetime
+import json
+import uuid
+
+from django.utils import timezone
+
+from app.api.json import ModelJSONEncoder, iterencode_chunked
+
+
+TESTING_DATA = {
+    'count': 3,
+    'previous': None,
+    'next': 'http://testserver/api/models/?page=2',
+    'results': [{
+        'uuid': uuid.UUID('b8a7c2a4-6f04-4d3b-9c0b-8a7f1e0f4b11'),
+        'created': datetime.datetime(2018, 2, 9, 14, 26, 1, 123456, tzinfo=timezone.utc),
+        'brand': 'Toyota é',
+        'purchased': datetime.date(2016, 12, 1),
+        'seats': 4,
+        'type-of-car': None,
+    }] * 3 + [[], {}],
+}
+
+
+def test_iterencode_chunked_same_as_dumps():
+    """
+    Test chunked encoding gives exactly the same output as `json.dumps` for any chunk size
+    """
+    expected = json.dumps(TESTING_DATA, cls=ModelJSONEncoder)
+
+    for chunk_size in (1, 2, 100):
+        assert ''.join(iterencode_chunked(TESTING_DATA, chunk_size=chunk_size)) == expected
+
+    non_str_keys = {1: 'one', 'list': []}
+    assert ''.join(iterencode_chunked(non_str_keys)) == json.dumps(non_str_keys, cls=ModelJSONEncoder)
+
+
+def test_model_json_encoder_types():
+    encoded = json.loads(json.dumps(TESTING_DATA, cls=ModelJSONEncoder))['results'][0]
+
+    assert encoded['uuid'] == 'b8a7c2a4-6f04-4d3b-9c0b-8a7f1e0f4b11'
+    assert encoded['created'] == '2018-02-09T14:26:01.123Z'
+    assert encoded['purchased'] == '2016-12-01'
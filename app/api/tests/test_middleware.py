@@ -0,0 +1,52 @@
+import json
+import logging
+
+import pytest
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from app.api.middleware import ConnectionHealthCheckMiddleware
+
+
+@pytest.mark.django_db
+def test_request_timing(caplog):
+    """
+    Test sampled request has Server-Timing header and is logged with its measurements
+    """
+    caplog.set_level(logging.INFO, logger='app.api.timing')
+
+    client = Client()
+    response = client.get(reverse('risk_api:model-list'), {})
+
+    assert response.status_code == 200
+    assert response['Server-Timing'].startswith('total;dur=')
+    assert 'db;dur=' in response['Server-Timing']
+    assert 'serialize;dur=' in response['Server-Timing']
+
+    log_data = json.loads(caplog.records[-1].getMessage())
+    assert log_data['url_name'] == 'risk_api:model-list'
+    assert log_data['status'] == 200
+    assert log_data['db_queries'] > 0
+    assert log_data['response_bytes'] == len(response.content)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_connection_health_check(monkeypatch):
+    """
+    Test kept database connection is closed before request only when health checks are on and it's unusable
+    """
+    closed = []
+    monkeypatch.setattr(connection, 'close', lambda: closed.append(True))
+    monkeypatch.setattr(connection, 'is_usable', lambda: False)
+    connection.ensure_connection()
+
+    middleware = ConnectionHealthCheckMiddleware(lambda request: HttpResponse())
+
+    middleware(RequestFactory().get('/'))
+    assert not closed
+
+    monkeypatch.setitem(connection.settings_dict, 'CONN_HEALTH_CHECKS', True)
+    middleware(RequestFactory().get('/'))
+    assert closed
@@ -0,0 +1,20 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, get_resolver, resolve
+
+
+@pytest.mark.django_db
+def test_api_urlconf_does_not_touch_database():
+    """
+    Test loading API-only URLconf and resolving API URLs runs no query, so a cold start doesn't need database
+    """
+    clear_url_caches()
+
+    with CaptureQueriesContext(connection) as queries:
+        get_resolver('config.urls_api').url_patterns
+        resolver_match = resolve('/api/models/', 'config.urls_api')
+
+    assert resolver_match.view_name == 'risk_api:model-list'
+    assert len(queries) == 0
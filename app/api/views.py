@@ -1,22 +1,48 @@
 import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from json import JSONDecodeError
 
+from django.core.exceptions import ValidationError
 from django.core.paginator import EmptyPage
-from django.http import JsonResponse, Http404, HttpResponse
+from django.db.models import Q, prefetch_related_objects
+from django.http import JsonResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic.detail import BaseDetailView
 from django.views.generic.list import BaseListView
 
-from app.api.json import ModelJSONEncoder
+from app.api.json import ModelJSONEncoder, iterencode_chunked
+from app.api.middleware import timing
 from app.api.models import SerializableMixin
 
 
+class InvalidQuery(Exception):
+    """
+    Raised while building list's queryset from invalid query parameters, returned as 400 error
+    """
+    pass
+
+
+class InvalidCursor(InvalidQuery):
+    pass
+
+
 class JsonResponseMixin:
+    # Response with a list longer than this is encoded and sent in chunks instead of as one big string
+    stream_list_length = 1000
+
+    def _has_long_list(self, data):
+        values = data.values() if isinstance(data, dict) else [data]
+        return any(isinstance(value, (list, tuple)) and len(value) > self.stream_list_length for value in values)
+
     def render_to_response(self, data, **kwargs):
         if data:
-            return JsonResponse(data, safe=False, encoder=ModelJSONEncoder, **kwargs)
+            if self._has_long_list(data):
+                return StreamingHttpResponse(
+                    iterencode_chunked(data, cls=ModelJSONEncoder), content_type='application/json', **kwargs)
+            with timing(self.request, 'serialize'):
+                return JsonResponse(data, safe=False, encoder=ModelJSONEncoder, **kwargs)
         else:
             return HttpResponse(data, **kwargs)
 
@@ -27,56 +53,159 @@ class JsonListView(JsonResponseMixin, BaseListView):
     paginate_by = 20
     paginate_url_name = None
 
+    # Sending `cursor` parameter (empty for the first page) switches to keyset pagination over these fields
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-created', '-id')
+
     def render_to_response(self, data, **kwargs):
         response = super().render_to_response(data, **kwargs)
         response['Allow'] = 'GET, POST'
         return response
 
     @classmethod
-    def _build_url_with_page(cls, request, url_name, page_number):
-        return '{scheme}://{host}{url}?page={page}'.format(
+    def _build_url_with_page(cls, request, url_name, page_number, url_kwargs=None, page_kwarg='page'):
+        """
+        Build link to another page keeping current query string, e.g. `limit`. `page` and `cursor`
+        are mutually exclusive so the other one is dropped.
+        """
+        query = request.GET.copy()
+        query.pop('page', None)
+        query.pop('cursor', None)
+        query[page_kwarg] = page_number
+
+        return '{scheme}://{host}{url}?{query}'.format(
             scheme=request.scheme,
             host=request.get_host(),
-            url=reverse(url_name),
-            page=page_number)
+            url=reverse(url_name, kwargs=url_kwargs),
+            query=query.urlencode())
+
+    def _build_page_link(self, page_number, page_kwarg='page'):
+        if self.paginate_url_name and page_number:
+            return JsonListView._build_url_with_page(
+                self.request, self.paginate_url_name, page_number, self.kwargs, page_kwarg)
+        return page_number
 
     def get_context_data(self, object_list=None, **kwargs):
         context = {}
 
         queryset = object_list if object_list is not None else self.object_list
-        context['count'] = queryset.count()
+
+        if self.request.GET.get('count') in ('0', 'false'):
+            context['count'] = None
+        else:
+            context['count'] = queryset.count()
 
         page_size = self.kwargs.get('limit') or self.request.GET.get('limit') or self.get_paginate_by(queryset)
         page_size = int(page_size)
 
-        if page_size > 0:
+        if page_size > 0 and self.cursor_query_param in self.request.GET:
+            queryset, previous_cursor, next_cursor = self.paginate_queryset_by_cursor(
+                queryset, page_size, self.request.GET.get(self.cursor_query_param))
+            context['previous'] = self._build_page_link(previous_cursor, self.cursor_query_param)
+            context['next'] = self._build_page_link(next_cursor, self.cursor_query_param)
+
+        elif page_size > 0:
             paginator, page, queryset, is_paginated = self.paginate_queryset(queryset, page_size)
             try:
-                context['previous'] = page.previous_page_number()
+                context['previous'] = self._build_page_link(page.previous_page_number())
             except EmptyPage:
                 context['previous'] = None
             try:
-                context['next'] = page.next_page_number()
+                context['next'] = self._build_page_link(page.next_page_number())
             except EmptyPage:
                 context['next'] = None
+
         else:
             context['previous'] = None
             context['next'] = None
 
-        if self.paginate_url_name:
-            if context['previous']:
-                context['previous'] = JsonListView._build_url_with_page(
-                    self.request, self.paginate_url_name, context['previous'])
-            if context['next']:
-                context['next'] = JsonListView._build_url_with_page(
-                    self.request, self.paginate_url_name, context['next'])
-
         context['results'] = queryset
 
         if self.extra_context is not None:
             kwargs.update(self.extra_context)
         return context
 
+    # Cursor pagination
+    # -------------------------------------
+
+    def _encode_cursor(self, obj, backwards):
+        position = [str(getattr(obj, field_name.lstrip('-'))) for field_name in self.cursor_ordering]
+        return urlsafe_b64encode(json.dumps({'p': position, 'r': backwards}).encode()).decode()
+
+    def _decode_cursor(self, queryset, cursor):
+        try:
+            cursor_data = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+            position = [
+                queryset.model._meta.get_field(field_name.lstrip('-')).to_python(value)
+                for field_name, value in zip(self.cursor_ordering, cursor_data['p'])]
+            backwards = bool(cursor_data['r'])
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise InvalidCursor('Cursor is invalid')
+
+        if len(position) != len(self.cursor_ordering) or None in position:
+            raise InvalidCursor('Cursor is invalid')
+
+        return position, backwards
+
+    def _filter_after_position(self, queryset, position, backwards):
+        """
+        Keyset condition for rows after `position` in `cursor_ordering` (before it when `backwards`),
+        e.g. `created < c OR (created = c AND id < i)` for `('-created', '-id')`.
+        """
+        condition = None
+        for i, field_name in enumerate(self.cursor_ordering):
+            descending = field_name.startswith('-') != backwards
+            lookup = '{field}__{op}'.format(field=field_name.lstrip('-'), op='lt' if descending else 'gt')
+
+            field_condition = Q(**{lookup: position[i]})
+            for previous_field_name, previous_value in zip(self.cursor_ordering[:i], position[:i]):
+                field_condition &= Q(**{previous_field_name.lstrip('-'): previous_value})
+
+            condition = field_condition if condition is None else condition | field_condition
+
+        return queryset.filter(condition)
+
+    def paginate_queryset_by_cursor(self, queryset, page_size, cursor):
+        """
+        Return a page of `queryset` after (or before) the position in `cursor`, together with
+        cursors of previous and next pages. Cost of each page does not depend on how deep it is.
+        """
+        if cursor:
+            position, backwards = self._decode_cursor(queryset, cursor)
+            queryset = self._filter_after_position(queryset, position, backwards)
+        else:
+            backwards = False
+
+        if backwards:
+            ordering = [f[1:] if f.startswith('-') else '-' + f for f in self.cursor_ordering]
+        else:
+            ordering = list(self.cursor_ordering)
+
+        page_objects = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(page_objects) > page_size
+        page_objects = page_objects[:page_size]
+
+        if backwards:
+            page_objects.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = bool(cursor), has_more
+
+        previous_cursor = self._encode_cursor(page_objects[0], True) if has_previous and page_objects else None
+        next_cursor = self._encode_cursor(page_objects[-1], False) if has_next and page_objects else None
+
+        return page_objects, previous_cursor, next_cursor
+
+    def get(self, request, *args, **kwargs):
+        try:
+            response = super().get(request, *args, **kwargs)
+        except Http404 as e:
+            return self.render_to_response({'error': str(e)}, status=404)
+        except InvalidQuery as e:
+            return self.render_to_response({'error': str(e)}, status=400)
+
+        return response
+
     def post(self, request, *args, **kwargs):
         try:
             data = json.loads(request.body)
@@ -95,6 +224,8 @@ class JsonListView(JsonResponseMixin, BaseListView):
         if obj:
             if isinstance(obj, SerializableMixin):
                 return_data = obj.to_dict()
+            elif isinstance(obj, dict):
+                return_data = obj
             else:
                 return_data = str(obj)
         else:
@@ -113,6 +244,9 @@ class JsonListView(JsonResponseMixin, BaseListView):
 class JsonDetailView(JsonResponseMixin, BaseDetailView):
     pk_field = 'pk'
 
+    # Relations `to_dict` reads, prefetched before serializing so `serialize` time has no queries
+    prefetch_related_lookups = ()
+
     def render_to_response(self, data, **kwargs):
         response = super().render_to_response(data, **kwargs)
         response['Allow'] = 'GET, PUT, DELETE'
@@ -122,7 +256,11 @@ class JsonDetailView(JsonResponseMixin, BaseDetailView):
         context = {}
 
         if self.object:
-            context.update(self.object.to_dict())
+            if self.prefetch_related_lookups:
+                with timing(self.request, 'values'):
+                    prefetch_related_objects([self.object], *self.prefetch_related_lookups)
+            with timing(self.request, 'serialize'):
+                context.update(self.object.to_dict())
 
         if self.extra_context is not None:
             kwargs.update(self.extra_context)
@@ -150,6 +288,8 @@ class JsonDetailView(JsonResponseMixin, BaseDetailView):
             response = super().get(request, *args, **kwargs)
         except Http404:
             return self.render_to_response({'error': 'Object not found'}, status=404)
+        except InvalidQuery as e:
+            return self.render_to_response({'error': str(e)}, status=400)
         except Exception as e:
             return self.render_to_response({'error': str(e)}, status=500)
 
@@ -172,12 +312,16 @@ class JsonDetailView(JsonResponseMixin, BaseDetailView):
 
         try:
             obj = self.perform_update(request, model_object, validated_data, *args, **kwargs)
+        except Http404 as e:
+            return self.render_to_response({'error': str(e)}, status=404)
         except Exception as e:
             return self.render_to_response({'error': str(e)}, status=500)
 
         if obj:
             if isinstance(obj, SerializableMixin):
                 return_data = obj.to_dict()
+            elif isinstance(obj, dict):
+                return_data = obj
             else:
                 return_data = str(obj)
         else:
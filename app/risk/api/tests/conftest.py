@@ -1,6 +1,8 @@
 import json
 
 import pytest
+from django.core.cache import cache
+from django.db import OperationalError, connection
 from django.test import Client
 from django.urls import reverse
 
@@ -28,6 +30,29 @@ TESTING_MODEL_OBJECT_VALUES = {
 }
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def max_query_params(monkeypatch):
+    """
+    Lower the number of parameters a query may have, failing queries with more of them the way
+    SQLite builds before 3.32 do past 999
+    """
+    limit = 20
+    monkeypatch.setattr(connection.features, 'max_query_params', limit)
+
+    def check_query_params(execute, sql, params, many, context):
+        if not many and params is not None and len(params) > limit:
+            raise OperationalError('too many SQL variables')
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(check_query_params):
+        yield limit
+
+
 @pytest.fixture(scope='function')
 def existing_risk_model():
     client = Client()
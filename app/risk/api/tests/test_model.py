@@ -1,12 +1,20 @@
 import copy
+import io
 import json
 import pytest
 import uuid
 
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from app.risk.api.tests.conftest import TESTING_MODEL_FIELDS
+from app.risk.api.views import RiskModelDetailView
+from app.risk.models import RiskModel, RiskModelField, RiskModelImport, RiskModelObject, RiskModelObjectValue
 from app.risk.api.tests.utils import matching_dict_in_list
 
 
@@ -148,6 +156,39 @@ def test_update_risk_model(existing_risk_model):
     assert next(filter(lambda field: field['name'] == 'Year', fields))
 
 
+@pytest.mark.django_db
+def test_update_risk_model_concurrently(monkeypatch, existing_risk_model):
+    """
+    Test updating a model changed or deleted by another request since it was read keeps that change
+    """
+    original_get_object = RiskModelDetailView.get_object
+    concurrent_change = {}
+
+    def get_object_then_change(self, *args, **kwargs):
+        risk_model = original_get_object(self, *args, **kwargs)
+        RiskModel.all_objects.filter(pk=risk_model.pk).update(**concurrent_change)
+        return risk_model
+
+    monkeypatch.setattr(RiskModelDetailView, 'get_object', get_object_then_change)
+
+    client = Client()
+    detail_url = reverse('risk_api:model-detail', args=[existing_risk_model['uuid']])
+    risk_model = RiskModel.objects.get(uuid=existing_risk_model['uuid'])
+    update_data = json.dumps({'name': 'Car', 'fields': existing_risk_model['fields']})
+
+    concurrent_change = {'schema_version': F('schema_version') + 1}
+    response = client.put(detail_url, update_data, content_type='application/json')
+
+    assert response.status_code == 200
+    assert RiskModel.objects.get(pk=risk_model.pk).schema_version == risk_model.schema_version + 2
+
+    concurrent_change = {'deleted': timezone.now()}
+    response = client.put(detail_url, update_data, content_type='application/json')
+
+    assert response.status_code == 404
+    assert RiskModel.all_objects.get(pk=risk_model.pk).deleted is not None
+
+
 @pytest.mark.django_db
 @pytest.mark.usefixtures('existing_risk_model')
 def test_delete_risk_model(existing_risk_model):
@@ -161,6 +202,37 @@ def test_delete_risk_model(existing_risk_model):
     assert response.status_code == 204
 
 
+@pytest.mark.django_db
+def test_delete_risk_model_purged_later(existing_risk_model_and_object):
+    """
+    Test deleted Risk Model is hidden at once and its rows are only removed by `purge_deleted_models`
+    """
+    risk_model, risk_object = existing_risk_model_and_object
+    RiskModelImport.objects.create(
+        risk_model=RiskModel.objects.get(uuid=risk_model['uuid']), checksum='0' * 40, rows_done=1)
+
+    client = Client()
+    response = client.delete(reverse('risk_api:model-detail', args=[risk_model['uuid']]))
+    assert response.status_code == 204
+
+    assert client.get(reverse('risk_api:model-detail', args=[risk_model['uuid']])).status_code == 404
+    assert json.loads(client.get(reverse('risk_api:model-list')).content)['count'] == 0
+    assert client.get(reverse('risk_api:object-list', args=[risk_model['uuid']])).status_code == 404
+    assert client.get(reverse('risk_api:object-detail', args=[risk_object['uuid']])).status_code == 404
+
+    assert RiskModelObjectValue.objects.count() == 4
+
+    stdout = io.StringIO()
+    call_command('purge_deleted_models', batch_size=3, stdout=stdout)
+
+    assert 'Purged 3/4 values' in stdout.getvalue()
+    assert not RiskModel.all_objects.exists()
+    assert not RiskModelField.objects.exists()
+    assert not RiskModelObject.objects.exists()
+    assert not RiskModelObjectValue.objects.exists()
+    assert not RiskModelImport.objects.exists()
+
+
 @pytest.mark.django_db
 def test_add_invalid_risk_model_fields():
     invalid_model_fields = copy.deepcopy(TESTING_MODEL_FIELDS)
@@ -219,3 +291,173 @@ def test_delete_risk_model_not_found(existing_risk_model):
                                   args=[new_uuid]), {}, content_type='application/json')
 
     assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_get_risk_model_not_modified(existing_risk_model):
+    """
+    Test getting Risk Model with ETag returns 304 without any database query until the model is updated
+    """
+    detail_url = reverse('risk_api:model-detail', args=[existing_risk_model['uuid']])
+
+    client = Client()
+    response = client.get(detail_url, {})
+
+    assert response.status_code == 200
+    etag = response['ETag']
+    assert response['Last-Modified']
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(detail_url, {}, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert len(queries) == 0
+
+    existing_risk_model['fields'][0]['name'] = 'Manufacturer'
+    response = client.put(detail_url, json.dumps({
+        'name': existing_risk_model['name'],
+        'fields': existing_risk_model['fields']
+    }), content_type='application/json')
+    assert response.status_code == 200
+
+    response = client.get(detail_url, {}, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert json.loads(response.content)['fields'][0]['name'] == 'Manufacturer'
+
+
+@pytest.mark.django_db
+def test_get_risk_model_without_cache(settings, existing_risk_model):
+    """
+    Test with caching off (production default without a shared cache) responses are fresh and still answer 304
+    """
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    detail_url = reverse('risk_api:model-detail', args=[existing_risk_model['uuid']])
+
+    client = Client()
+    etag = client.get(detail_url, {})['ETag']
+
+    assert client.get(detail_url, {}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    response = client.put(detail_url, json.dumps({
+        'name': 'Truck',
+        'fields': existing_risk_model['fields']
+    }), content_type='application/json')
+    assert response.status_code == 200
+
+    response = client.get(detail_url, {}, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert json.loads(response.content)['name'] == 'Truck'
+
+
+@pytest.mark.django_db
+def test_list_risk_models_after_create(existing_risk_model):
+    """
+    Test cached list of Risk Models includes a newly created model
+    """
+    client = Client()
+    response = client.get(reverse('risk_api:model-list'), {})
+    assert json.loads(response.content)['count'] == 1
+
+    client.post(reverse('risk_api:model-list'), json.dumps({
+        'name': 'House',
+        'fields': TESTING_MODEL_FIELDS
+    }), content_type='application/json')
+
+    response = client.get(reverse('risk_api:model-list'), {})
+    assert json.loads(response.content)['count'] == 2
+
+
+@pytest.mark.django_db
+def test_update_risk_model_fields_in_bulk():
+    """
+    Test updating many fields at once takes the same number of queries as updating a few, and new
+    fields get unique slugs and `field_id`s continuing the model's sequence
+    """
+    client = Client()
+
+    def update_fields(new_field_count):
+        response = client.post(reverse('risk_api:model-list'), json.dumps({
+            'name': 'Car',
+            'fields': TESTING_MODEL_FIELDS
+        }), content_type='application/json')
+        risk_model = json.loads(response.content)
+
+        fields = risk_model['fields'][:-1]
+        fields[0]['name'] = 'Model'
+        fields += [{'name': 'Brand', 'type': 'text'} for _ in range(new_field_count)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.put(reverse('risk_api:model-detail', args=[risk_model['uuid']]), json.dumps({
+                'name': risk_model['name'],
+                'fields': fields
+            }), content_type='application/json')
+
+        assert response.status_code == 200
+        return json.loads(response.content)['fields'], len(queries)
+
+    fields, few_fields_queries = update_fields(2)
+    new_fields = [field for field in fields if field['name'] == 'Brand']
+    assert sorted(field['slug'] for field in new_fields) == ['brand-2', 'brand-3']
+    assert sorted(field['field_id'] for field in new_fields) == [5, 6]
+    assert next(field for field in fields if field['field_id'] == 1)['name'] == 'Model'
+
+    fields, many_fields_queries = update_fields(100)
+    new_fields = [field for field in fields if field['name'] == 'Brand']
+    assert len(new_fields) == 100
+    assert len({field['slug'] for field in new_fields}) == 100
+    assert not [field for field in fields if field['field_id'] == 4]
+
+    assert many_fields_queries == few_fields_queries
+
+
+@pytest.mark.django_db
+def test_risk_model_stats(existing_risk_model):
+    """
+    Test statistics of values by field type, with list filters applied and cached until objects change
+    """
+    client = Client()
+    object_list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+    stats_url = reverse('risk_api:model-stats', args=[existing_risk_model['uuid']])
+
+    for brand, purchased, seats, car_type in [
+            ('Toyota', '2016-12-01', 4, 'Sedan'),
+            ('Honda', '2016-12-20', 7, 'SUV'),
+            ('Tesla', '2017-02-03', 5, 'Sedan')]:
+        client.post(object_list_url, json.dumps({
+            'brand': brand, 'purchased': purchased, 'seats': seats, 'type-of-car': car_type,
+        }), content_type='application/json')
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(stats_url)
+
+    assert response.status_code == 200
+    # Model, object count and one query for each of the 4 field types, fields come from cached validator
+    assert len(queries) == 6
+
+    stats = json.loads(response.content)
+    assert stats['count'] == 3
+    assert stats['fields']['brand'] == {'type': 'text', 'count': 3}
+    assert stats['fields']['seats'] == {'type': 'number', 'count': 3, 'min': 4, 'max': 7, 'avg': 5.333333333333333,
+                                        'sum': 16}
+    assert stats['fields']['purchased'] == {
+        'type': 'date', 'count': 3, 'min': '2016-12-01', 'max': '2017-02-03',
+        'histogram': [{'month': '2016-12-01', 'count': 2}, {'month': '2017-02-01', 'count': 1}]}
+    assert stats['fields']['type-of-car'] == {'type': 'enum', 'count': 3, 'frequencies': {'Sedan': 2, 'SUV': 1}}
+
+    # Filtered
+    stats = json.loads(client.get(stats_url, {'seats__gte': 5}).content)
+    assert stats['count'] == 2
+    assert stats['fields']['type-of-car']['frequencies'] == {'Sedan': 1, 'SUV': 1}
+
+    assert client.get(stats_url, {'seats': 'many'}).status_code == 400
+
+    # Cached until an object is added
+    with CaptureQueriesContext(connection) as queries:
+        assert json.loads(client.get(stats_url).content)['count'] == 3
+    assert len(queries) == 0
+
+    client.post(object_list_url, json.dumps({'brand': 'Ford'}), content_type='application/json')
+    assert json.loads(client.get(stats_url).content)['count'] == 4
@@ -1,13 +1,20 @@
+import csv
+import io
 import json
 
 import copy
 import pytest
 import uuid
+from contextlib import contextmanager
 
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from app.risk.api.tests.conftest import TESTING_MODEL_OBJECT_VALUES
+from app.risk.models import RiskModelImport, RiskModelObjectProjection, RiskModelObjectValue
 from app.risk.api.tests.utils import matching_dict_in_list
 
 
@@ -34,6 +41,164 @@ def test_list_risk_model_objects(existing_risk_model_and_object):
     assert matching_dict_in_list(TESTING_MODEL_OBJECT_VALUES, response_json.get('results')) >= 0
 
 
+@pytest.mark.django_db
+def test_list_risk_model_objects_of_other_model(existing_risk_model_and_object, existing_risk_model):
+    """
+    Test listing Risk Model objects only returns objects of the requested model
+    """
+    client = Client()
+    response = client.get(reverse('risk_api:object-list', args=[existing_risk_model['uuid']]), {})
+
+    assert response.status_code == 200
+
+    response_json = json.loads(response.content)
+
+    assert response_json.get('count') == 0
+    assert response_json.get('results') == []
+
+
+@pytest.mark.django_db
+def test_list_risk_model_objects_model_not_found():
+    client = Client()
+    response = client.get(reverse('risk_api:object-list', args=[uuid.uuid4()]), {})
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_list_risk_model_objects_query_count(existing_risk_model_and_object):
+    """
+    Test number of queries when listing Risk Model objects does not grow with number of objects
+    """
+    risk_model_dict, risk_model_object_dict = existing_risk_model_and_object
+    list_url = reverse('risk_api:object-list', args=[risk_model_dict['uuid']])
+
+    client = Client()
+    with CaptureQueriesContext(connection) as single_object_queries:
+        response = client.get(list_url, {})
+    assert response.status_code == 200
+
+    for _ in range(5):
+        client.post(list_url, json.dumps(TESTING_MODEL_OBJECT_VALUES), content_type='application/json')
+
+    with CaptureQueriesContext(connection) as many_objects_queries:
+        response = client.get(list_url, {})
+    assert response.status_code == 200
+
+    response_json = json.loads(response.content)
+    assert len(response_json.get('results')) == 6
+    assert all(matching_dict_in_list(TESTING_MODEL_OBJECT_VALUES, [result]) >= 0
+               for result in response_json.get('results'))
+
+    assert len(many_objects_queries) == len(single_object_queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('projection', [False, True])
+def test_list_all_risk_model_objects(settings, existing_risk_model, max_query_params, projection):
+    """
+    Test listing all objects (`limit=0`) of a model with more objects than parameters a query may have
+    """
+    settings.RISK_OBJECT_PROJECTION = projection
+    list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+
+    client = Client()
+    for _ in range(max_query_params + 5):
+        client.post(list_url, json.dumps(TESTING_MODEL_OBJECT_VALUES), content_type='application/json')
+
+    for params in [{'limit': 0}, {'limit': 0, 'fields': 'brand,seats'}]:
+        response = client.get(list_url, params)
+
+        assert response.status_code == 200
+        results = json.loads(response.content)['results']
+        assert len(results) == max_query_params + 5
+        assert all(result['brand'] == 'Toyota' and result['seats'] == 4 for result in results)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('projection', [False, True])
+def test_serialize_timing_has_no_queries(monkeypatch, settings, existing_risk_model_and_object, projection):
+    """
+    Test values are read before `serialize` timing of model detail, object list and object detail starts
+    """
+    settings.RISK_OBJECT_PROJECTION = projection
+    risk_model_dict, risk_model_object_dict = existing_risk_model_and_object
+    if projection:
+        call_command('rebuild_object_projections', stdout=io.StringIO())
+
+    running_timings = []
+    serialize_queries = []
+
+    @contextmanager
+    def recording_timing(request, name):
+        running_timings.append(name)
+        try:
+            yield
+        finally:
+            running_timings.pop()
+
+    def record_query(execute, sql, params, many, context):
+        if 'serialize' in running_timings:
+            serialize_queries.append(sql)
+        return execute(sql, params, many, context)
+
+    monkeypatch.setattr('app.api.views.timing', recording_timing)
+    monkeypatch.setattr('app.risk.api.views.timing', recording_timing)
+
+    client = Client()
+    with connection.execute_wrapper(record_query):
+        for url in [reverse('risk_api:model-detail', args=[risk_model_dict['uuid']]),
+                    reverse('risk_api:object-list', args=[risk_model_dict['uuid']]),
+                    reverse('risk_api:object-detail', args=[risk_model_object_dict['uuid']])]:
+            assert client.get(url, {}).status_code == 200
+
+    assert serialize_queries == []
+
+
+@pytest.mark.django_db
+def test_list_risk_model_objects_by_cursor(existing_risk_model):
+    """
+    Test walking through Risk Model objects forward and backward using cursor pagination
+    """
+    list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+
+    client = Client()
+    created_uuids = []
+    for _ in range(5):
+        response = client.post(list_url, json.dumps(TESTING_MODEL_OBJECT_VALUES), content_type='application/json')
+        created_uuids.insert(0, json.loads(response.content)['uuid'])
+
+    # Forward
+    response_json = json.loads(client.get(list_url, {'cursor': '', 'limit': 2, 'count': 'false'}).content)
+    assert response_json['count'] is None
+    assert response_json['previous'] is None
+    assert [result['uuid'] for result in response_json['results']] == created_uuids[0:2]
+
+    response_json = json.loads(client.get(response_json['next']).content)
+    assert [result['uuid'] for result in response_json['results']] == created_uuids[2:4]
+
+    response_json = json.loads(client.get(response_json['next']).content)
+    assert [result['uuid'] for result in response_json['results']] == created_uuids[4:5]
+    assert response_json['next'] is None
+
+    # Backward
+    response_json = json.loads(client.get(response_json['previous']).content)
+    assert [result['uuid'] for result in response_json['results']] == created_uuids[2:4]
+
+    response_json = json.loads(client.get(response_json['previous']).content)
+    assert [result['uuid'] for result in response_json['results']] == created_uuids[0:2]
+    assert response_json['previous'] is None
+
+
+@pytest.mark.django_db
+def test_list_risk_model_objects_invalid_cursor(existing_risk_model):
+    client = Client()
+    response = client.get(reverse('risk_api:object-list', args=[existing_risk_model['uuid']]),
+                          {'cursor': 'INVALID_CURSOR'})
+
+    assert response.status_code == 400
+
+
 @pytest.mark.django_db
 def test_add_risk_model_object(existing_risk_model):
     """
@@ -96,6 +261,39 @@ def test_update_risk_model_object(existing_risk_model_and_object):
     assert response_json['type-of-car'] == 'Sedan'
 
 
+@pytest.mark.django_db
+def test_update_risk_model_object_query_count(existing_risk_model_and_object):
+    """
+    Test updating risk model object is saved, and number of queries does not grow with number of changed values
+    """
+    risk_model_dict, risk_model_object_dict = existing_risk_model_and_object
+    detail_url = reverse('risk_api:object-detail', args=[risk_model_object_dict['uuid']])
+
+    client = Client()
+    with CaptureQueriesContext(connection) as single_value_queries:
+        response = client.put(detail_url, json.dumps({'brand': 'Volvo'}), content_type='application/json')
+    assert response.status_code == 200
+
+    updated_values = {
+        'brand': 'Ford',
+        'purchased': '2017-12-10',
+        'seats': 6,
+        'type-of-car': 'SUV',
+    }
+    with CaptureQueriesContext(connection) as many_values_queries:
+        response = client.put(detail_url, json.dumps(updated_values), content_type='application/json')
+    assert response.status_code == 200
+    response_json = json.loads(response.content)
+    assert all(response_json[slug] == value for slug, value in updated_values.items())
+
+    # Each changed type of value is one UPDATE query
+    assert len(many_values_queries) <= len(single_value_queries) + 3
+
+    response = client.get(detail_url, {}, content_type='application/json')
+    response_json = json.loads(response.content)
+    assert all(response_json[slug] == value for slug, value in updated_values.items())
+
+
 @pytest.mark.django_db
 def test_delete_risk_model_object(existing_risk_model_and_object):
     """
@@ -170,3 +368,414 @@ def test_missing_required_risk_model_value(existing_risk_model):
                            json.dumps(invalid_object_values), content_type='application/json')
 
     assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_bulk_add_risk_model_objects(existing_risk_model):
+    """
+    Test adding many Risk Model Objects in one request, as JSON array and as NDJSON
+    """
+    client = Client()
+    bulk_url = reverse('risk_api:object-bulk', args=[existing_risk_model['uuid']])
+
+    response = client.post(bulk_url, json.dumps([TESTING_MODEL_OBJECT_VALUES] * 3), content_type='application/json')
+
+    assert response.status_code == 201
+    assert json.loads(response.content)['count'] == 3
+
+    response = client.post(bulk_url, '\n'.join([json.dumps(TESTING_MODEL_OBJECT_VALUES)] * 2) + '\n',
+                           content_type='application/x-ndjson')
+
+    assert response.status_code == 201
+    assert json.loads(response.content)['count'] == 2
+
+    response = client.get(reverse('risk_api:object-list', args=[existing_risk_model['uuid']]), {})
+    response_json = json.loads(response.content)
+
+    assert response_json['count'] == 5
+    assert all(matching_dict_in_list(TESTING_MODEL_OBJECT_VALUES, [result]) >= 0
+               for result in response_json['results'])
+
+
+@pytest.mark.django_db
+def test_bulk_add_many_risk_model_objects(settings, existing_risk_model, max_query_params):
+    """
+    Test bulk adding, and rebuilding projections of, more objects than parameters a query may have
+    """
+    settings.RISK_OBJECT_PROJECTION = True
+    object_count = max_query_params + 5
+
+    client = Client()
+    response = client.post(reverse('risk_api:object-bulk', args=[existing_risk_model['uuid']]),
+                           json.dumps([TESTING_MODEL_OBJECT_VALUES] * object_count), content_type='application/json')
+
+    assert response.status_code == 201
+    assert json.loads(response.content)['count'] == object_count
+    assert RiskModelObjectValue.objects.filter(risk_object__risk_model__uuid=existing_risk_model['uuid']).count() \
+        == object_count * len(TESTING_MODEL_OBJECT_VALUES)
+
+    RiskModelObjectProjection.objects.all().delete()
+    call_command('rebuild_object_projections', existing_risk_model['uuid'], stdout=io.StringIO())
+
+    assert RiskModelObjectProjection.objects.count() == object_count
+
+
+@pytest.mark.django_db
+def test_bulk_add_invalid_risk_model_objects(existing_risk_model):
+    """
+    Test bulk adding with invalid objects returns errors by index and creates nothing
+    """
+    invalid_object_values = copy.deepcopy(TESTING_MODEL_OBJECT_VALUES)
+    invalid_object_values['seats'] = 'INVALID_NUMBER'
+
+    client = Client()
+    response = client.post(reverse('risk_api:object-bulk', args=[existing_risk_model['uuid']]),
+                           json.dumps([TESTING_MODEL_OBJECT_VALUES, invalid_object_values, 'INVALID_OBJECT']),
+                           content_type='application/json')
+
+    assert response.status_code == 400
+
+    response_json = json.loads(response.content)
+    assert set(response_json['errors'].keys()) == {'1', '2'}
+    assert 'seats' in response_json['errors']['1']
+
+    response = client.get(reverse('risk_api:object-list', args=[existing_risk_model['uuid']]), {})
+    assert json.loads(response.content)['count'] == 0
+
+
+@pytest.mark.django_db
+def test_export_risk_model_objects(existing_risk_model_and_object):
+    """
+    Test exporting Risk Model Objects as NDJSON and CSV
+    """
+    risk_model_dict, risk_model_object_dict = existing_risk_model_and_object
+    export_url = reverse('risk_api:object-export', args=[risk_model_dict['uuid']])
+
+    client = Client()
+    response = client.get(export_url, {})
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])['uuid'] == risk_model_object_dict['uuid']
+    assert matching_dict_in_list(TESTING_MODEL_OBJECT_VALUES, [json.loads(lines[0])]) >= 0
+
+    response = client.get(export_url, {'format': 'csv'})
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/csv'
+
+    rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+    assert len(rows) == 1
+    assert rows[0]['uuid'] == risk_model_object_dict['uuid']
+    assert rows[0]['brand'] == TESTING_MODEL_OBJECT_VALUES['brand']
+    assert rows[0]['purchased'] == TESTING_MODEL_OBJECT_VALUES['purchased']
+    assert rows[0]['seats'] == str(TESTING_MODEL_OBJECT_VALUES['seats'])
+
+
+@pytest.mark.django_db
+def test_add_risk_model_object_after_schema_update(existing_risk_model):
+    """
+    Test validation of new objects follows model's fields after they are updated
+    """
+    client = Client()
+    object_list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+
+    response = client.post(object_list_url, json.dumps(TESTING_MODEL_OBJECT_VALUES), content_type='application/json')
+    assert response.status_code == 201
+
+    updated_fields = copy.deepcopy(existing_risk_model['fields'])
+    updated_fields.append({'name': 'Owner', 'type': 'text', 'is_required': True})
+    response = client.put(reverse('risk_api:model-detail', args=[existing_risk_model['uuid']]), json.dumps({
+        'name': existing_risk_model['name'],
+        'fields': updated_fields,
+    }), content_type='application/json')
+    assert response.status_code == 200
+
+    response = client.post(object_list_url, json.dumps(TESTING_MODEL_OBJECT_VALUES), content_type='application/json')
+    assert response.status_code == 400
+    assert 'owner' in json.loads(response.content)
+
+    object_values = dict(TESTING_MODEL_OBJECT_VALUES, owner='John')
+    response = client.post(object_list_url, json.dumps(object_values), content_type='application/json')
+    assert response.status_code == 201
+    assert json.loads(response.content)['owner'] == 'John'
+
+
+@pytest.mark.django_db
+def test_filter_risk_model_objects(existing_risk_model):
+    """
+    Test filtering Risk Model Objects by values of number, date, enum and text fields
+    """
+    client = Client()
+    list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+
+    for brand, purchased, seats, type_of_car in [
+            ('Toyota', '2016-12-01', 4, 'Sedan'),
+            ('Volvo', '2017-06-15', 7, 'SUV'),
+            ('Honda', '2018-01-20', 5, 'SUV')]:
+        client.post(list_url, json.dumps({
+            'brand': brand,
+            'purchased': purchased,
+            'seats': seats,
+            'type-of-car': type_of_car,
+        }), content_type='application/json')
+
+    def filtered_brands(params):
+        response = client.get(list_url, params)
+        assert response.status_code == 200
+        return sorted(result['brand'] for result in json.loads(response.content)['results'])
+
+    assert filtered_brands({'seats__gte': 5}) == ['Honda', 'Volvo']
+    assert filtered_brands({'purchased__lt': '2017-01-01'}) == ['Toyota']
+    assert filtered_brands({'type-of-car': 'SUV'}) == ['Honda', 'Volvo']
+    assert filtered_brands({'type-of-car': 'SUV', 'seats__lte': 5}) == ['Honda']
+    assert filtered_brands({'brand__in': 'Toyota,Honda'}) == ['Honda', 'Toyota']
+
+    response = client.get(list_url, {'type-of-car': 'SUV', 'count': 'true'})
+    assert json.loads(response.content)['count'] == 2
+
+    assert client.get(list_url, {'seats__gte': 'INVALID_NUMBER'}).status_code == 400
+    assert client.get(list_url, {'seats__contains': 5}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_filter_risk_model_objects_by_field_named_like_parameter():
+    """
+    Test list parameters are not read as filters of fields with the same slug, which are filtered with a lookup
+    """
+    client = Client()
+    response = client.post(reverse('risk_api:model-list'), json.dumps({
+        'name': 'Policy',
+        'fields': [{'name': 'Limit', 'type': 'number'}, {'name': 'Count', 'type': 'number'}],
+    }), content_type='application/json')
+    model_uuid = json.loads(response.content)['uuid']
+    list_url = reverse('risk_api:object-list', args=[model_uuid])
+
+    for limit in [1000, 5000, 10000]:
+        client.post(list_url, json.dumps({'limit': limit, 'count': 1}), content_type='application/json')
+
+    response_json = json.loads(client.get(list_url, {'limit': 2}).content)
+    assert response_json['count'] == 3
+    assert len(response_json['results']) == 2
+
+    response = client.get(list_url, {'cursor': '', 'count': 'false'})
+    assert response.status_code == 200
+    assert json.loads(response.content)['count'] is None
+
+    response_json = json.loads(client.get(list_url, {'limit__exact': 5000, 'count__gte': 1}).content)
+    assert [result['limit'] for result in response_json['results']] == [5000]
+
+    response = client.get(reverse('risk_api:model-stats', args=[model_uuid]), {'limit': 1, 'limit__gte': 5000})
+    assert json.loads(response.content)['count'] == 2
+
+
+@pytest.mark.django_db
+def test_risk_model_object_projection(settings, existing_risk_model):
+    """
+    Test objects read from projections are the same as read from values, after object update and field rename
+    """
+    settings.RISK_OBJECT_PROJECTION = True
+
+    client = Client()
+    response = client.post(reverse('risk_api:object-list', args=[existing_risk_model['uuid']]),
+                           json.dumps(TESTING_MODEL_OBJECT_VALUES), content_type='application/json')
+    object_uuid = json.loads(response.content)['uuid']
+    detail_url = reverse('risk_api:object-detail', args=[object_uuid])
+
+    assert RiskModelObjectProjection.objects.filter(risk_object__uuid=object_uuid).exists()
+
+    response = client.put(detail_url, json.dumps({'seats': 6}), content_type='application/json')
+    assert json.loads(response.content)['seats'] == 6
+
+    updated_fields = copy.deepcopy(existing_risk_model['fields'])
+    updated_fields[0]['slug'] = 'manufacturer'
+    client.put(reverse('risk_api:model-detail', args=[existing_risk_model['uuid']]), json.dumps({
+        'name': existing_risk_model['name'],
+        'fields': updated_fields[:3],
+    }), content_type='application/json')
+
+    expected = {
+        'uuid': object_uuid,
+        'manufacturer': 'Toyota',
+        'purchased': '2016-12-01',
+        'seats': 6,
+    }
+
+    response_json = json.loads(client.get(detail_url).content)
+    assert {key: response_json.get(key) for key in expected} == expected
+    assert 'type-of-car' not in response_json
+
+    response_json = json.loads(
+        client.get(reverse('risk_api:object-list', args=[existing_risk_model['uuid']])).content)
+    assert {key: response_json['results'][0].get(key) for key in expected} == expected
+
+    # Rebuilt projection is the same
+    RiskModelObjectProjection.objects.all().delete()
+    call_command('rebuild_object_projections', existing_risk_model['uuid'], stdout=io.StringIO())
+
+    assert RiskModelObjectProjection.objects.filter(risk_object__uuid=object_uuid).exists()
+    assert json.loads(client.get(detail_url).content) == response_json['results'][0]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('projection', [False, True])
+def test_risk_model_object_fields_subset(settings, existing_risk_model, projection):
+    """
+    Test `fields` returns only values of the selected fields and `omit_empty` leaves out null values
+    """
+    settings.RISK_OBJECT_PROJECTION = projection
+
+    client = Client()
+    list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+    response = client.post(list_url, json.dumps({'brand': 'Toyota', 'seats': 4}), content_type='application/json')
+    detail_url = reverse('risk_api:object-detail', args=[json.loads(response.content)['uuid']])
+
+    for url, get_object in [(list_url, lambda response_json: response_json['results'][0]),
+                            (detail_url, lambda response_json: response_json)]:
+        risk_object = get_object(json.loads(client.get(url, {'fields': 'brand,purchased'}).content))
+        assert set(risk_object) == {'uuid', 'created', 'brand', 'purchased'}
+        assert risk_object['purchased'] is None
+
+        risk_object = get_object(json.loads(client.get(url, {'fields': 'brand,purchased', 'omit_empty': ''}).content))
+        assert set(risk_object) == {'uuid', 'created', 'brand'}
+
+        risk_object = get_object(json.loads(client.get(url, {'omit_empty': 'true'}).content))
+        assert set(risk_object) == {'uuid', 'created', 'brand', 'seats'}
+
+        assert client.get(url, {'fields': 'brand,colour'}).status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('projection', [False, True])
+def test_risk_model_object_sparse_values(settings, existing_risk_model, projection):
+    """
+    Test only present values are stored, and missing ones are still returned as null
+    """
+    settings.RISK_OBJECT_PROJECTION = projection
+
+    client = Client()
+    list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+    response = client.post(list_url, json.dumps({'brand': 'Toyota', 'seats': 4}), content_type='application/json')
+
+    assert response.status_code == 201
+    risk_object = json.loads(response.content)
+    assert RiskModelObjectValue.objects.filter(risk_object__uuid=risk_object['uuid']).count() == 2
+
+    expected = {'brand': 'Toyota', 'purchased': None, 'seats': 4, 'type-of-car': None}
+    detail_url = reverse('risk_api:object-detail', args=[risk_object['uuid']])
+    for response_object in [risk_object,
+                            json.loads(client.get(detail_url).content),
+                            json.loads(client.get(list_url).content)['results'][0]]:
+        assert {key: response_object.get(key, 'missing') for key in expected} == expected
+
+    response = client.put(detail_url, json.dumps({'purchased': '2016-12-01'}), content_type='application/json')
+    assert json.loads(response.content)['purchased'] == '2016-12-01'
+    assert json.loads(response.content)['type-of-car'] is None
+    assert RiskModelObjectValue.objects.filter(risk_object__uuid=risk_object['uuid']).count() == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('search_table', [True, False])
+def test_search_risk_model_objects(monkeypatch, existing_risk_model, search_table):
+    """
+    Test `q` finds objects by prefix of words of text and enum values, with full-text index and without it
+    """
+    if not search_table:
+        monkeypatch.setattr('app.risk.models.uses_search_table', lambda connection: False)
+
+    client = Client()
+    list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+
+    object_uuids = {}
+    for brand, type_of_car in [('Toyota Corolla', 'Sedan'), ('Land Rover', 'SUV'), ('Toyota Land Cruiser', 'SUV')]:
+        response = client.post(list_url, json.dumps({'brand': brand, 'seats': 4, 'type-of-car': type_of_car}),
+                               content_type='application/json')
+        object_uuids[brand] = json.loads(response.content)['uuid']
+
+    def found_brands(query, **params):
+        response = client.get(list_url, dict(params, q=query))
+        assert response.status_code == 200
+        return sorted(result['brand'] for result in json.loads(response.content)['results'])
+
+    assert found_brands('toyota') == ['Toyota Corolla', 'Toyota Land Cruiser']
+    assert found_brands('LAN') == ['Land Rover', 'Toyota Land Cruiser']
+    assert found_brands('toy land') == ['Toyota Land Cruiser']
+    assert found_brands('suv') == ['Land Rover', 'Toyota Land Cruiser']
+    assert found_brands('suv', **{'seats__gte': 5}) == []
+    assert found_brands('"toyota*') == ['Toyota Corolla', 'Toyota Land Cruiser']
+    assert found_brands('volvo') == []
+    assert found_brands('!!') == []
+    # Only word prefixes match
+    assert found_brands('ota') == []
+    assert found_brands('over') == []
+
+    response_json = json.loads(client.get(list_url, {'q': 'toyota', 'count': 'true'}).content)
+    assert response_json['count'] == 2
+    assert response_json['truncated'] is False
+
+    # Index follows updated and deleted values
+    client.put(reverse('risk_api:object-detail', args=[object_uuids['Toyota Corolla']]),
+               json.dumps({'brand': 'Volvo XC90'}), content_type='application/json')
+    client.delete(reverse('risk_api:object-detail', args=[object_uuids['Land Rover']]))
+
+    assert found_brands('toyota') == ['Toyota Land Cruiser']
+    assert found_brands('volvo') == ['Volvo XC90']
+    assert found_brands('rover') == []
+
+    # Only the best matches are listed, and response tells there are more
+    monkeypatch.setattr('app.risk.api.views.SEARCH_RESULTS_LIMIT', 1)
+    response_json = json.loads(client.get(list_url, {'q': 's'}).content)
+    assert response_json['count'] == 1
+    assert response_json['truncated'] is True
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('workers', [0, 2])
+def test_import_risk_model_objects(tmpdir, existing_risk_model, workers):
+    """
+    Test CSV import creates valid rows, reports rejected ones and doesn't import a file twice
+    """
+    csv_path = tmpdir.join('objects.csv')
+    csv_path.write('\n'.join([
+        'brand,seats,purchased,type-of-car,colour',
+        'Toyota,4,2016-12-01,Sedan,Red',
+        'Volvo,SEVEN,2017-06-15,SUV,Blue',
+        'Honda,5,,SUV,Green',
+        ',5,2018-01-20,SUV,Black',
+        'Tesla,5',
+        'Mazda,2,2019-03-03,Coupe,White',
+    ]) + '\n')
+
+    def import_objects(**options):
+        stdout = io.StringIO()
+        call_command('import_objects', existing_risk_model['uuid'], str(csv_path), chunk_size=2, workers=workers,
+                     stdout=stdout, stderr=io.StringIO(), **options)
+        return stdout.getvalue()
+
+    import_objects()
+
+    client = Client()
+    list_url = reverse('risk_api:object-list', args=[existing_risk_model['uuid']])
+    results = json.loads(client.get(list_url, {'limit': 0}).content)['results']
+    assert sorted(result['brand'] for result in results) == ['Honda', 'Toyota']
+    assert {result['brand']: result['purchased'] for result in results} == {'Honda': None, 'Toyota': '2016-12-01'}
+
+    with open(str(csv_path) + '.rejected.csv', newline='') as rejected_file:
+        rejected = list(csv.DictReader(rejected_file))
+    assert [(row['brand'], row['row']) for row in rejected] == [('Volvo', '3'), ('', '5'), ('Tesla', '6'), ('Mazda', '7')]
+    assert json.loads(rejected[0]['errors']) == {'seats': 'This field is invalid'}
+    assert json.loads(rejected[1]['errors']) == {'brand': 'This field is required'}
+
+    # Checkpoint says file is done
+    assert RiskModelImport.objects.get(risk_model__uuid=existing_risk_model['uuid']).rows_done == 6
+    assert '6 rows done, 0 imported' in import_objects()
+    assert len(json.loads(client.get(list_url, {'limit': 0}).content)['results']) == 2
+
+    import_objects(restart=True)
+    assert len(json.loads(client.get(list_url, {'limit': 0}).content)['results']) == 4
+
+    with pytest.raises(CommandError):
+        call_command('import_objects', str(uuid.uuid4()), str(csv_path))
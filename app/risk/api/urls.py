@@ -7,6 +7,9 @@ urlpatterns = [
     path('models/', views.RiskModelListView.as_view(), name='model-list'),
     path('models/<str:model_uuid>/', views.RiskModelDetailView.as_view(), name='model-detail'),
 
+    path('models/<str:model_uuid>/stats/', views.RiskModelStatsView.as_view(), name='model-stats'),
     path('models/<str:model_uuid>/objects/', views.RiskModelObjectListView.as_view(), name='object-list'),
+    path('models/<str:model_uuid>/objects/bulk/', views.RiskModelObjectBulkView.as_view(), name='object-bulk'),
+    path('models/<str:model_uuid>/objects/export/', views.RiskModelObjectExportView.as_view(), name='object-export'),
     path('models/objects/<str:object_uuid>/', views.RiskModelObjectDetailView.as_view(), name='object-detail'),
 ]
@@ -1,9 +1,25 @@
+import csv
+import datetime
+import json
 import numbers
-
-from django.http import Http404
-
-from app.api.views import JsonListView, JsonDetailView
-from app.risk.models import RiskModel, RiskModelField, RiskModelObject, RiskModelObjectValue, FieldType
+from collections import OrderedDict
+from json import JSONDecodeError
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Value, When
+from django.http import Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from app.api.cache import CachedResponseMixin, invalidate_namespace, objects_cache_namespace
+from app.api.json import ModelJSONEncoder
+from app.api.middleware import timing
+from app.api.views import JsonListView, JsonDetailView, JsonResponseMixin, InvalidQuery
+from app.risk.models import RiskModel, RiskModelField, RiskModelObject, RiskModelObjectValue, \
+    RiskModelObjectProjection, FieldType
+from app.risk.validators import get_validator
 
 
 def _validate_model_fields(data, errors, on_update=False):
@@ -50,8 +66,8 @@ def _validate_model_fields(data, errors, on_update=False):
                 else:
                     validated_field['slug'] = field.get('slug')
 
-            # Type
-            if not on_update:
+            # Type (can only be set when creating field)
+            if not on_update or not field.get('field_id'):
                 if not field.get('type'):
                     field_has_error = True
                     field_errors['type'] = 'Type must not be empty'
@@ -85,16 +101,128 @@ def _validate_model_fields(data, errors, on_update=False):
     return None, errors
 
 
-class RiskModelListView(JsonListView):
+def _create_model_fields(risk_model, fields_data, taken_slugs=()):
+    """
+    Create fields of `risk_model` with one INSERT. Fields without `field_id` get ids reserved from
+    model's sequence at once, and slugs are made unique against `taken_slugs` in memory.
+    """
+    new_fields = [RiskModelField(risk_model=risk_model, **field) for field in fields_data]
+    if not new_fields:
+        return []
+
+    fields_without_id = [field for field in new_fields if not field.field_id]
+    if fields_without_id:
+        reserved_ids = RiskModelField.reserve_field_ids(risk_model.id, len(fields_without_id))
+        for field, field_id in zip(fields_without_id, reserved_ids):
+            field.field_id = field_id
+
+    RiskModelField.resolve_slugs(new_fields, taken_slugs)
+    return RiskModelField.objects.bulk_create(new_fields)
+
+
+def _get_response_fields(validator, query_params):
+    """
+    Fields selected by `fields` parameter (comma-separated slugs), or None if all fields are returned
+    """
+    if not query_params.get('fields'):
+        return None
+
+    slugs = [slug for slug in query_params['fields'].split(',') if slug]
+    unknown_slugs = [slug for slug in slugs if slug not in validator.fields_by_slug]
+    if unknown_slugs:
+        raise InvalidQuery('Unknown fields: {}'.format(', '.join(unknown_slugs)))
+
+    return [validator.fields_by_slug[slug] for slug in slugs]
+
+
+def _is_omit_empty(query_params):
+    return query_params.get('omit_empty', 'false') not in ('0', 'false')
+
+
+VALUE_FILTER_LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte', 'in')
+
+# Parameters of the list itself, never read as a filter of a field with the same slug
+LIST_QUERY_PARAMS = ('limit', 'page', 'cursor', 'count', 'q', 'fields', 'omit_empty')
+
+
+def _filter_objects_by_values(queryset, validator, query_params):
+    """
+    Filter objects by query parameters in `{slug}` or `{slug}__{lookup}` format, e.g.
+    `seats__gte=4&type-of-car=SUV`. Each one becomes an `EXISTS` subquery on the single typed
+    value column of that field. Parameters that are not field's slug are ignored, and so are
+    `LIST_QUERY_PARAMS`, a field slugged `limit` is filtered with `limit__exact=`.
+    """
+    for param_index, (param, param_value) in enumerate(query_params.items()):
+        if param in LIST_QUERY_PARAMS:
+            continue
+
+        slug, _, lookup = param.partition('__')
+        if slug not in validator.fields_by_slug:
+            continue
+
+        lookup = lookup or 'exact'
+        if lookup not in VALUE_FILTER_LOOKUPS:
+            raise InvalidQuery('Filter lookup `{}` is not supported'.format(lookup))
+
+        field = validator.fields_by_slug[slug]
+        naive_values = param_value.split(',') if lookup == 'in' else [param_value]
+
+        try:
+            values = [validator.to_valid_value(slug, naive_value) for naive_value in naive_values]
+        except (ValueError, TypeError):
+            raise InvalidQuery('Filter value of `{}` is invalid'.format(slug))
+
+        object_values = RiskModelObjectValue.objects.filter(**{
+            'risk_object': OuterRef('pk'),
+            'field': field,
+            'value_{type}__{lookup}'.format(type=field.type, lookup=lookup): values if lookup == 'in' else values[0],
+        })
+
+        annotation_name = '_value_filter_{}'.format(param_index)
+        queryset = queryset.annotate(**{annotation_name: Exists(object_values)}).filter(**{annotation_name: True})
+
+    return queryset
+
+
+# Search results are ranked, only this many best matches are listed
+SEARCH_RESULTS_LIMIT = 200
+
+
+def _search_objects(queryset, validator, query_params):
+    """
+    Keep objects matching `q` parameter, best matches first (see
+    `RiskModelObjectValueManager.search_objects`). Page pagination keeps that order, cursor
+    pagination lists them newest first.
+
+    Return the queryset, and whether more than `SEARCH_RESULTS_LIMIT` objects matched and only
+    the best ones were kept.
+    """
+    query = query_params.get('q', '').strip()
+    if not query:
+        return queryset, False
+
+    # One more than listed tells whether there are more matches
+    object_ids = RiskModelObjectValue.objects.search_objects(validator.fields, query, SEARCH_RESULTS_LIMIT + 1)
+    truncated = len(object_ids) > SEARCH_RESULTS_LIMIT
+    object_ids = object_ids[:SEARCH_RESULTS_LIMIT]
+    if not object_ids:
+        return queryset.none(), truncated
+
+    return queryset.filter(id__in=object_ids).order_by(
+        Case(*[When(id=object_id, then=Value(position)) for position, object_id in enumerate(object_ids)],
+             output_field=IntegerField())), truncated
+
+
+class RiskModelListView(CachedResponseMixin, JsonListView):
     model = RiskModel
     paginate_url_name = 'risk_api:model-list'
+    cache_namespace = 'risk_model'
 
     def perform_create(self, request, validated_data, *args, **kwargs):
         risk_model = RiskModel.objects.create(name=validated_data['name'])
+        _create_model_fields(risk_model, validated_data['fields'])
 
-        for field in validated_data['fields']:
-            RiskModelField.objects.create(risk_model=risk_model, **field)
-
+        invalidate_namespace(self.cache_namespace)
         return risk_model
 
     def validate_on_create(self, request, data, *args, **kwargs):
@@ -113,10 +241,12 @@ class RiskModelListView(JsonListView):
         return validated_data, errors
 
 
-class RiskModelDetailView(JsonDetailView):
+class RiskModelDetailView(CachedResponseMixin, JsonDetailView):
     model = RiskModel
     pk_url_kwarg = 'model_uuid'
     pk_field = 'uuid'
+    cache_namespace = 'risk_model'
+    prefetch_related_lookups = ('fields', )
 
     def validate_on_update(self, request, model_object, data, *args, **kwargs):
         validated_data = {}
@@ -136,29 +266,87 @@ class RiskModelDetailView(JsonDetailView):
     def perform_update(self, request, model_object, validated_data, *args, **kwargs):
         risk_model = model_object
 
-        risk_model.name = validated_data.get('name')
-        risk_model.save()
+        # Increased in database, so concurrent updates each get a version of their own, and only
+        # these columns are written, so a model deleted in the meantime stays deleted
+        if not RiskModel.objects.filter(pk=risk_model.pk).update(
+                name=validated_data.get('name'), schema_version=F('schema_version') + 1):
+            raise Http404('No risk model found matching the query')
+        risk_model.refresh_from_db(fields=['name', 'schema_version'])
+
+        # Updating model fields, the changes are worked out in memory from one query of existing fields
+        existing_fields = {field.field_id: field for field in risk_model.fields.all()}
+        submitted_fields = validated_data.get('fields')
+
+        updating_fields = []
+        updating_columns = set()
+        new_fields_data = []
+        for field in submitted_fields:
+            risk_model_field = existing_fields.get(field.get('field_id'))
+            if risk_model_field is None:
+                new_fields_data.append(field)
+                continue
+
+            changed_columns = {column for column, value in field.items() if getattr(risk_model_field, column) != value}
+            if changed_columns:
+                for column in changed_columns:
+                    setattr(risk_model_field, column, field[column])
+                updating_fields.append(risk_model_field)
+                updating_columns |= changed_columns
 
-        # Updating model fields
-        existing_fields = set(risk_model.fields.all())
-        updated_fields = set()
-
-        for field in validated_data.get('fields'):
-            field_id = field.get('field_id')
-            risk_model_field, _ = RiskModelField.objects.update_or_create(
-                risk_model=risk_model, field_id=field_id, defaults=field)
+        # Remove fields
+        # Object projections are keyed by `field_id`, which is never reused, so they are still valid
+        # after fields are renamed or deleted
+        submitted_field_ids = {field.get('field_id') for field in submitted_fields}
+        deleting_fields = [field for field_id, field in existing_fields.items() if field_id not in submitted_field_ids]
+        if deleting_fields:
+            RiskModelField.objects.filter(id__in=[f.id for f in deleting_fields]).delete()
 
-            updated_fields.add(risk_model_field)
+        RiskModelField.objects.bulk_update_fields(updating_fields, sorted(updating_columns))
 
-        # Remove fields
-        deleting_fields = existing_fields - updated_fields
-        RiskModelField.objects.filter(id__in=[f.id for f in deleting_fields]).delete()
+        kept_slugs = [field.slug for field_id, field in existing_fields.items() if field_id in submitted_field_ids]
+        _create_model_fields(risk_model, new_fields_data, taken_slugs=kept_slugs)
 
+        invalidate_namespace(self.cache_namespace)
+        invalidate_namespace(objects_cache_namespace(risk_model.uuid))
         return risk_model
 
     def perform_delete(self, request, model_object, validated_data, *args, **kwargs):
         risk_model = model_object
-        risk_model.delete()
+        risk_model.mark_deleted()
+
+        invalidate_namespace(self.cache_namespace)
+        invalidate_namespace(objects_cache_namespace(risk_model.uuid))
+
+
+class RiskModelStatsView(CachedResponseMixin, JsonDetailView):
+    """
+    Statistics of values of model's objects by field, optionally of objects matching the same
+    filters as object list. Cached until any object of the model changes.
+    """
+    model = RiskModel
+    pk_url_kwarg = 'model_uuid'
+    pk_field = 'uuid'
+    http_method_names = ['get', 'head', 'options']
+
+    def get_cache_namespace(self):
+        return objects_cache_namespace(self.kwargs.get('model_uuid'))
+
+    def render_to_response(self, data, **kwargs):
+        response = super().render_to_response(data, **kwargs)
+        response['Allow'] = 'GET'
+        return response
+
+    def get_context_data(self, **kwargs):
+        risk_model = self.object
+        validator = get_validator(risk_model)
+
+        risk_objects = _filter_objects_by_values(
+            RiskModelObject.objects.filter(risk_model=risk_model), validator, self.request.GET)
+
+        return {
+            'count': risk_objects.count(),
+            'fields': RiskModelObjectValue.objects.field_stats(risk_objects, validator.fields),
+        }
 
 
 class RiskModelObjectListView(JsonListView):
@@ -166,7 +354,7 @@ class RiskModelObjectListView(JsonListView):
     paginate_url_name = 'risk_api:object-list'
 
     _risk_model = None
-    _risk_model_fields = None
+    _search_truncated = False
 
     # Cached values
     def _get_risk_model(self, uuid):
@@ -174,109 +362,286 @@ class RiskModelObjectListView(JsonListView):
             self._risk_model = RiskModel.objects.get(uuid=uuid)
         return self._risk_model
 
-    # Cached values
-    def _get_risk_model_fields(self, risk_model):
-        if not self._risk_model_fields:
-            self._risk_model_fields = RiskModelField.objects.filter(risk_model=risk_model)
-        return self._risk_model_fields
+    def get_queryset(self):
+        try:
+            risk_model = self._get_risk_model(uuid=self.kwargs.get('model_uuid'))
+        except RiskModel.DoesNotExist:
+            raise Http404('No risk model found matching the query')
+
+        validator = get_validator(risk_model)
+        queryset = RiskModelObject.objects.filter(risk_model=risk_model)
+        queryset = _filter_objects_by_values(queryset, validator, self.request.GET)
+        queryset, self._search_truncated = _search_objects(queryset, validator, self.request.GET)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        risk_model = self._get_risk_model(uuid=self.kwargs.get('model_uuid'))
+        fields = _get_response_fields(get_validator(risk_model), self.request.GET)
+
+        context = super().get_context_data(**kwargs)
+        if self.request.GET.get('q', '').strip():
+            context['truncated'] = self._search_truncated
+
+        # Page and its values are read before serializing, so `serialize` time has no queries
+        with timing(self.request, 'values'):
+            fetched_values = RiskModelObject.fetch_values(context['results'], fields=fields)
+        with timing(self.request, 'serialize'):
+            context['results'] = RiskModelObject.to_dict_list(
+                fetched_values, omit_empty=_is_omit_empty(self.request.GET))
+        return context
 
     def validate_on_create(self, request, data, *args, **kwargs):
         risk_model = self._get_risk_model(uuid=kwargs.get('model_uuid'))
-        risk_model_fields = self._get_risk_model_fields(risk_model=risk_model)
-
-        validated_data = {}
-        errors = {}
-
-        for field in risk_model_fields:
-            if field.is_required and not data.get(field.slug):
-                errors[field.slug] = 'This field is required'
-            elif data.get(field.slug):
-                try:
-                    if field.type == FieldType.ENUM:
-                        validated_data[field.slug] = FieldType(field.type).to_valid_value(
-                            data.get(field.slug), enum_choices=field.choices.split(','))
-                    else:
-                        validated_data[field.slug] = FieldType(field.type).to_valid_value(
-                            data.get(field.slug))
-
-                except ValueError:
-                    errors[field.slug] = 'This field is invalid'
-
-        return validated_data, errors
+        return get_validator(risk_model).validate(data)
 
     def perform_create(self, request, validated_data, *args, **kwargs):
         risk_model = self._get_risk_model(uuid=kwargs.get('model_uuid'))
-        risk_model_fields = self._get_risk_model_fields(risk_model=risk_model)
+        risk_model_fields = get_validator(risk_model).fields
 
         risk_object = RiskModelObject.objects.create(risk_model=risk_model)
-        for field in risk_model_fields:
-            object_attrs = {
-                'risk_object': risk_object,
-                'field': field,
-                'field_type': field.type,
-                'value': validated_data.get(field.slug),
-            }
+        RiskModelObjectValue.objects.bulk_create(
+            RiskModelObjectValue.from_validated_data(risk_object.id, risk_model_fields, validated_data))
 
-            RiskModelObjectValue.objects.create(**object_attrs)
+        if settings.RISK_OBJECT_PROJECTION:
+            RiskModelObjectProjection.from_values(risk_object.id, risk_model_fields, validated_data).save(
+                force_insert=True)
 
+        invalidate_namespace(objects_cache_namespace(risk_model.uuid))
         return risk_object
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class RiskModelObjectBulkView(JsonResponseMixin, View):
+    """
+    Create many objects in one request. Request body is either a JSON array of objects or
+    newline-delimited JSON (`application/x-ndjson`), one object per line.
+
+    All objects are validated before anything is written. If any of them is invalid, nothing is
+    created and errors are returned by object index.
+    """
+    chunk_size = 1000
+
+    def _parse_objects(self, request):
+        if request.content_type in ('application/x-ndjson', 'application/jsonlines'):
+            # Read line by line so whole body is never kept in memory as one string
+            return [json.loads(line.decode()) for line in request if line.strip()]
+
+        data = json.loads(request.read().decode())
+        if not isinstance(data, list):
+            raise ValueError('Request body must be a list of objects')
+        return data
+
+    def post(self, request, *args, **kwargs):
+        try:
+            risk_model = RiskModel.objects.get(uuid=kwargs.get('model_uuid'))
+        except RiskModel.DoesNotExist:
+            return self.render_to_response({'error': 'No risk model found matching the query'}, status=404)
+
+        try:
+            data = self._parse_objects(request)
+        except JSONDecodeError as e:
+            return self.render_to_response({'error': 'JSON decode error: {}'.format(str(e))}, status=500)
+        except ValueError as e:
+            return self.render_to_response({'error': str(e)}, status=400)
+
+        validator = get_validator(risk_model)
+
+        validated_objects = []
+        errors = {}
+        for index, object_data in enumerate(data):
+            if not isinstance(object_data, dict):
+                errors[index] = {'error': 'Object must be a JSON object'}
+                continue
+
+            validated_data, object_errors = validator.validate(object_data)
+            if object_errors:
+                errors[index] = object_errors
+            else:
+                validated_objects.append(validated_data)
+
+        if errors:
+            return self.render_to_response({'errors': errors}, status=400)
+
+        try:
+            created_uuids = self.perform_bulk_create(risk_model, validator.fields, validated_objects)
+        except Exception as e:
+            return self.render_to_response({'error': str(e)}, status=500)
+
+        return self.render_to_response({'count': len(created_uuids), 'results': created_uuids}, status=201)
+
+    def perform_bulk_create(self, risk_model, risk_model_fields, validated_objects):
+        created_uuids = []
+
+        with transaction.atomic():
+            for start in range(0, len(validated_objects), self.chunk_size):
+                risk_objects = RiskModelObject.bulk_create_with_values(
+                    risk_model, risk_model_fields, validated_objects[start:start + self.chunk_size])
+                created_uuids.extend(risk_object.uuid for risk_object in risk_objects)
+
+        invalidate_namespace(objects_cache_namespace(risk_model.uuid))
+        return created_uuids
+
+
+class _Echo:
+    """
+    File-like object that returns what is written, used with `csv.writer` to stream rows
+    """
+    def write(self, value):
+        return value
+
+
+class RiskModelObjectExportView(JsonResponseMixin, View):
+    """
+    Stream all objects of a model as newline-delimited JSON, or as CSV with `?format=csv`.
+
+    Values are read through a server-side cursor ordered by object and pivoted into one row
+    per object on the fly, so memory use stays the same however many objects the model has.
+    """
+    chunk_size = 2000
+
+    VALUE_TYPES = ('text', 'number', 'date', 'enum')
+
+    def get(self, request, *args, **kwargs):
+        try:
+            risk_model = RiskModel.objects.get(uuid=kwargs.get('model_uuid'))
+        except RiskModel.DoesNotExist:
+            return self.render_to_response({'error': 'No risk model found matching the query'}, status=404)
+
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return self.render_to_response({'error': 'Format must be either ndjson or csv'}, status=400)
+
+        field_slugs = OrderedDict(
+            RiskModelField.objects.filter(risk_model=risk_model).order_by('field_id').values_list('id', 'slug'))
+        rows = self._iter_object_rows(risk_model, field_slugs)
+
+        if export_format == 'csv':
+            content = self._iter_csv_lines(rows, ['uuid', 'created'] + list(field_slugs.values()))
+            content_type = 'text/csv'
+        else:
+            content = (json.dumps(row, cls=ModelJSONEncoder) + '\n' for row in rows)
+            content_type = 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="{uuid}.{format}"'.format(
+            uuid=risk_model.uuid, format=export_format)
+        return response
+
+    def _iter_object_rows(self, risk_model, field_slugs):
+        # Reverse relation in `values_list` is a LEFT JOIN, objects without any value still get a row
+        object_values = RiskModelObject.objects.filter(risk_model=risk_model).order_by('id').values_list(
+            'id', 'uuid', 'created', 'risk_values__field_id', 'risk_values__field_type',
+            *['risk_values__value_{}'.format(value_type) for value_type in self.VALUE_TYPES])
+
+        row = None
+        row_object_id = None
+        for object_id, object_uuid, created, field_id, field_type, *typed_values in object_values.iterator(
+                chunk_size=self.chunk_size):
+            if object_id != row_object_id:
+                if row is not None:
+                    yield row
+
+                row_object_id = object_id
+                row = {'uuid': object_uuid, 'created': created}
+                row.update((slug, None) for slug in field_slugs.values())
+
+            if field_id in field_slugs and field_type in self.VALUE_TYPES:
+                row[field_slugs[field_id]] = typed_values[self.VALUE_TYPES.index(field_type)]
+
+        if row is not None:
+            yield row
+
+    def _iter_csv_lines(self, rows, column_names):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(column_names)
+
+        for row in rows:
+            yield writer.writerow([
+                row[column_name].isoformat() if isinstance(row[column_name], datetime.date) else row[column_name]
+                for column_name in column_names])
+
+
 class RiskModelObjectDetailView(JsonDetailView):
-    model = RiskModelObject
+    queryset = RiskModelObject.objects.filter(risk_model__deleted__isnull=True).select_related('risk_model')
     pk_url_kwarg = 'object_uuid'
     pk_field = 'uuid'
 
-    _risk_model_fields = None
-
-    # Cached values
-    def _get_risk_model_fields(self, risk_model):
-        if not self._risk_model_fields:
-            self._risk_model_fields = RiskModelField.objects.filter(risk_model=risk_model)
-        return self._risk_model_fields
+    def get_context_data(self, **kwargs):
+        risk_object = self.object
+        validator = get_validator(risk_object.risk_model)
+        fields = _get_response_fields(validator, self.request.GET)
+        omit_empty = _is_omit_empty(self.request.GET)
+
+        if settings.RISK_OBJECT_PROJECTION:
+            try:
+                with timing(self.request, 'values'):
+                    projection = RiskModelObjectProjection.objects.get(risk_object=risk_object)
+            except RiskModelObjectProjection.DoesNotExist:
+                pass
+            else:
+                projected_slugs = validator.projected_slugs
+                if fields is not None:
+                    projected_slugs = {(field.risk_model_id, field.field_id): field.slug for field in fields}
+                with timing(self.request, 'serialize'):
+                    return projection.to_dict(risk_object, projected_slugs, omit_empty=omit_empty)
+
+        object_values = RiskModelObjectValue.objects.filter(risk_object=risk_object)
+        if fields is not None:
+            object_values = object_values.filter(field_id__in=[field.id for field in fields])
+        with timing(self.request, 'values'):
+            object_values = list(object_values)
+
+        field_slugs = {field.id: field.slug for field in (validator.fields if fields is None else fields)}
+        with timing(self.request, 'serialize'):
+            return risk_object.to_dict(field_slugs=field_slugs, object_values=object_values, omit_empty=omit_empty)
 
     def validate_on_update(self, request, model_object, data, *args, **kwargs):
-        validated_data = {}
-        errors = {}
+        risk_object = model_object
+        return get_validator(risk_object.risk_model).validate(data, check_required=False)
 
+    def perform_update(self, request, model_object, validated_data, *args, **kwargs):
+        """
+        Read all existing values in one query, then write only values that have changed. Response
+        is built from these values in memory rather than reading them again.
+        """
         risk_object = model_object
-        risk_model_fields = self._get_risk_model_fields(risk_model=risk_object.risk_model)
+        risk_model_fields = get_validator(risk_object.risk_model).fields
 
+        object_values = {object_value.field_id: object_value
+                         for object_value in RiskModelObjectValue.objects.filter(risk_object=risk_object)}
+
+        new_values = []
+        changed_values = []
         for field in risk_model_fields:
-            if data.get(field.slug):
-                try:
-                    if field.type == FieldType.ENUM:
-                        validated_data[field.slug] = FieldType(field.type).to_valid_value(
-                            data.get(field.slug), enum_choices=field.choices.split(','))
-                    else:
-                        validated_data[field.slug] = FieldType(field.type).to_valid_value(
-                            data.get(field.slug))
-
-                except ValueError:
-                    errors[field.slug] = 'This field is invalid'
+            value = validated_data.get(field.slug)
+            if not value:
+                continue
 
-        return validated_data, errors
+            object_value = object_values.get(field.id)
+            if object_value is None:
+                object_value = RiskModelObjectValue(
+                    risk_object=risk_object, field=field, field_type=field.type, value=value)
+                object_values[field.id] = object_value
+                new_values.append(object_value)
+            elif object_value.value != value:
+                object_value.value = value
+                changed_values.append(object_value)
 
-    def perform_update(self, request, model_object, validated_data, *args, **kwargs):
-        risk_object = model_object
-        risk_model_fields = self._get_risk_model_fields(risk_model=risk_object.risk_model)
+        RiskModelObjectValue.objects.bulk_update_values(changed_values)
+        RiskModelObjectValue.objects.bulk_create(new_values)
 
-        for field in risk_model_fields:
-            if validated_data.get(field.slug):
-                try:
-                    object_value = RiskModelObjectValue.objects.get(risk_object=risk_object, field=field)
-                except RiskModelObjectValue.DoesNotExist:
-                    RiskModelObjectValue.objects.create(
-                        risk_object=risk_object,
-                        field=field,
-                        field_type=field.type,
-                        value=validated_data.get(field.slug))
-                else:
-                    object_value.value = validated_data.get(field.slug)
-                    object_value.save()
+        if settings.RISK_OBJECT_PROJECTION:
+            RiskModelObjectProjection.from_values(risk_object.id, risk_model_fields, {
+                field.slug: object_values[field.id].value
+                for field in risk_model_fields if field.id in object_values}).save()
 
-        return risk_object
+        invalidate_namespace(objects_cache_namespace(risk_object.risk_model.uuid))
+
+        field_slugs = {field.id: field.slug for field in risk_model_fields}
+        return risk_object.to_dict(field_slugs=field_slugs, object_values=object_values.values())
 
     def perform_delete(self, request, model_object, validated_data, *args, **kwargs):
         risk_object = model_object
         risk_object.delete()
+
+        invalidate_namespace(objects_cache_namespace(risk_object.risk_model.uuid))
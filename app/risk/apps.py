@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class RiskConfig(AppConfig):
     name = 'app.risk'
+
+    def ready(self):
+        from app.api.db import configure_sqlite_connection
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='configure_sqlite_connection')
@@ -0,0 +1,64 @@
+import datetime
+import re
+from collections import OrderedDict
+from functools import lru_cache
+
+
+# `YYYY-MM-DD`, optionally followed by time without timezone
+ISO_DATETIME_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?)?$')
+
+DATE_CACHE_SIZE = 4096
+
+# Returned by `_parse_iso_date_cached` for values that aren't ISO dates
+_NOT_ISO = object()
+
+# Values dateutil failed to parse (oldest first, at most DATE_CACHE_SIZE), so they fail again without parsing
+_dateutil_failures = OrderedDict()
+
+
+def parse_date(value):
+    """
+    Parse `value` to `datetime` like `dateutil.parser.parse` does, raise ValueError or TypeError
+    if it isn't a date.
+
+    Strict ISO 8601 values, which is what clients send, are converted directly and results of
+    recent ones are cached. Other formats are parsed by dateutil once, which is many times slower,
+    and values it fails to parse are cached too.
+    """
+    result = _parse_iso_date_cached(value)
+    if result is _NOT_ISO:
+        if value in _dateutil_failures:
+            raise ValueError('{!r} is not a date'.format(value))
+
+        # dateutil fills parts missing in value from today's date, so only its failures are cached
+        try:
+            return _dateutil_parse(value)
+        except (ValueError, OverflowError):
+            _dateutil_failures[value] = True
+            while len(_dateutil_failures) > DATE_CACHE_SIZE:
+                _dateutil_failures.popitem(last=False)
+            raise ValueError('{!r} is not a date'.format(value))
+    if result is None:
+        raise ValueError('{!r} is not a date'.format(value))
+    return result
+
+
+def _dateutil_parse(value):
+    # Imported on first use, it's slow to import and most values never need it
+    from dateutil.parser import parse
+    return parse(value)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_iso_date_cached(value):
+    match = ISO_DATETIME_RE.match(value)
+    if not match:
+        return _NOT_ISO
+
+    year, month, day, hour, minute, second, fraction = match.groups()
+    try:
+        return datetime.datetime(
+            int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+            int((fraction or '0').ljust(6, '0')))
+    except ValueError:
+        return None
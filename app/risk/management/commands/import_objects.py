@@ -0,0 +1,212 @@
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.api.cache import invalidate_namespace, objects_cache_namespace
+from app.risk.models import RiskModel, RiskModelField, RiskModelImport, RiskModelObject
+from app.risk.validators import RiskModelValidator, get_validator
+
+
+VALIDATOR_FIELDS = ('id', 'risk_model_id', 'field_id', 'slug', 'type', 'choices', 'is_required')
+
+# Validator of worker process, compiled from the first chunk it gets
+_worker_validator = None
+_worker_field_rows = None
+
+
+def validate_chunk(field_rows, columns, first_row_number, rows):
+    """
+    Validate rows of a chunk in a worker process. `field_rows` are `VALIDATOR_FIELDS` of model's
+    fields and `columns` the field slug of each column (None if it's ignored).
+
+    Return validated data of valid rows, and `(row number, row, errors)` of rejected ones.
+    """
+    global _worker_validator, _worker_field_rows
+    if _worker_field_rows != field_rows:
+        _worker_validator = RiskModelValidator(
+            [RiskModelField(**dict(zip(VALIDATOR_FIELDS, field_row))) for field_row in field_rows])
+        _worker_field_rows = field_rows
+
+    validated_objects = []
+    rejected_rows = []
+    for row_number, row in enumerate(rows, first_row_number):
+        if len(row) != len(columns):
+            rejected_rows.append((row_number, row, {
+                'error': 'Row has {} columns, header has {}'.format(len(row), len(columns))}))
+            continue
+
+        validated_data, errors = _worker_validator.validate(
+            {slug: value for slug, value in zip(columns, row) if slug})
+        if errors:
+            rejected_rows.append((row_number, row, errors))
+        else:
+            validated_objects.append(validated_data)
+
+    return validated_objects, rejected_rows
+
+
+def _file_checksum(path):
+    checksum = hashlib.sha1()
+    with open(path, 'rb') as checksum_file:
+        for block in iter(lambda: checksum_file.read(1024 * 1024), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Import objects of a risk model from a CSV file with a column per field slug'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_uuid')
+        parser.add_argument('csv_file')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Rows validated by a worker and written in one transaction')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of processes validating rows, 0 validates them in this process')
+        parser.add_argument('--rejected', help='CSV report of rejected rows (default: `{csv_file}.rejected.csv`)')
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--restart', action='store_true',
+                            help='Import the file from the beginning, even if it was (partly) imported before')
+
+    def handle(self, *args, **options):
+        try:
+            risk_model = RiskModel.objects.get(uuid=options['model_uuid'])
+        except (RiskModel.DoesNotExist, ValidationError):
+            raise CommandError('Risk model {} is not found'.format(options['model_uuid']))
+
+        if not os.path.isfile(options['csv_file']):
+            raise CommandError('File {} is not found'.format(options['csv_file']))
+
+        validator = get_validator(risk_model)
+        field_rows = tuple(tuple(getattr(field, name) for name in VALIDATOR_FIELDS) for field in validator.fields)
+
+        # Rows done are counted in database, in the same transaction as the objects they created, so
+        # an interrupted import goes on from the first row not written
+        risk_model_import, _ = RiskModelImport.objects.get_or_create(
+            risk_model=risk_model, checksum=_file_checksum(options['csv_file']))
+        if options['restart']:
+            risk_model_import.rows_done = 0
+            risk_model_import.save(update_fields=['rows_done'])
+        rows_done = risk_model_import.rows_done
+
+        rejected_path = options['rejected'] or '{}.rejected.csv'.format(options['csv_file'])
+        resuming = rows_done > 0 and os.path.exists(rejected_path)
+
+        with open(options['csv_file'], newline='', encoding=options['encoding']) as csv_file, \
+                open(rejected_path, 'a' if resuming else 'w', newline='', encoding=options['encoding']) as rejected_file:
+            reader = csv.reader(csv_file)
+            header = next(reader, None)
+            if not header:
+                raise CommandError('File {} has no header row'.format(options['csv_file']))
+            columns = self.map_columns(header, validator)
+
+            rejected_writer = csv.writer(rejected_file)
+            if not resuming:
+                rejected_writer.writerow(['row', 'errors'] + header)
+
+            if rows_done:
+                self.stdout.write('Skipping {} rows imported before'.format(rows_done))
+
+            chunks = self.read_chunks(reader, options['chunk_size'], skip=rows_done)
+            self.imported = self.rejected = 0
+            self.start = time.monotonic()
+
+            try:
+                for validated_objects, rejected_rows in self.validate_chunks(
+                        chunks, field_rows, columns, options['workers']):
+                    rows_done += len(validated_objects) + len(rejected_rows)
+                    risk_model_import.rows_done = rows_done
+                    self.write_chunk(risk_model_import, validator.fields, validated_objects, rejected_rows,
+                                     rejected_writer, rejected_file)
+                    if options['verbosity'] > 1:
+                        self.write_progress(rows_done)
+            finally:
+                invalidate_namespace(objects_cache_namespace(risk_model.uuid))
+
+        self.write_progress(rows_done)
+        if self.rejected:
+            self.stdout.write(self.style.WARNING('Rejected rows are in {}'.format(rejected_path)))
+        self.stdout.write(self.style.SUCCESS('Imported {file} into {model} ({uuid})'.format(
+            file=options['csv_file'], model=risk_model, uuid=risk_model.uuid)))
+
+    def map_columns(self, header, validator):
+        """
+        Field slug of each column, None for columns not matching any field
+        """
+        columns = [name.strip() for name in header]
+
+        duplicates = sorted({name for name in columns if name and columns.count(name) > 1})
+        if duplicates:
+            raise CommandError('Columns are duplicated: {}'.format(', '.join(duplicates)))
+
+        ignored = [name for name in columns if name not in validator.fields_by_slug]
+        if ignored:
+            self.stderr.write('Ignoring columns not matching a field slug: {}'.format(', '.join(ignored)))
+
+        return [name if name in validator.fields_by_slug else None for name in columns]
+
+    def read_chunks(self, reader, chunk_size, skip=0):
+        """
+        Yield `(number of first row, rows)` of each chunk, after skipping `skip` rows. Row numbers
+        count the header as row 1, like a spreadsheet.
+        """
+        row_number = 2 + skip
+        reader = itertools.islice(reader, skip, None)
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            yield row_number, rows
+            row_number += len(rows)
+
+    def validate_chunks(self, chunks, field_rows, columns, workers):
+        """
+        Validate chunks in a pool of `workers` processes, results are yielded in file order. Only a
+        few chunks per worker are read ahead, so the file is never loaded in memory at once.
+        """
+        if workers <= 0:
+            for first_row_number, rows in chunks:
+                yield validate_chunk(field_rows, columns, first_row_number, rows)
+            return
+
+        with ProcessPoolExecutor(workers) as executor:
+            pending = deque()
+            for first_row_number, rows in chunks:
+                pending.append(executor.submit(validate_chunk, field_rows, columns, first_row_number, rows))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def write_chunk(self, risk_model_import, risk_model_fields, validated_objects, rejected_rows,
+                    rejected_writer, rejected_file):
+        with transaction.atomic():
+            if validated_objects:
+                RiskModelObject.bulk_create_with_values(
+                    risk_model_import.risk_model, risk_model_fields, validated_objects)
+
+            # Reported before commit, so a rejected row may be reported twice but is never missed
+            for row_number, row, errors in rejected_rows:
+                rejected_writer.writerow([row_number, json.dumps(errors)] + row)
+            rejected_file.flush()
+
+            risk_model_import.save(update_fields=['rows_done'])
+
+        self.imported += len(validated_objects)
+        self.rejected += len(rejected_rows)
+
+    def write_progress(self, rows_done):
+        elapsed = time.monotonic() - self.start
+        self.stdout.write('{rows} rows done, {imported} imported, {rejected} rejected ({rate:.0f} rows/s)'.format(
+            rows=rows_done, imported=self.imported, rejected=self.rejected,
+            rate=(self.imported + self.rejected) / elapsed if elapsed else 0))
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from app.risk.models import RiskModel, RiskModelField, RiskModelImport, RiskModelObject, \
+    RiskModelObjectProjection, RiskModelObjectValue
+
+
+def _raw_delete(model, pks):
+    """
+    Delete rows by primary key with a plain DELETE, skipping Django's collector which loads every
+    related row into memory to send signals
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {table} WHERE {pk} IN ({params})'.format(
+            table=connection.ops.quote_name(model._meta.db_table),
+            pk=connection.ops.quote_name(model._meta.pk.column),
+            params=', '.join(['%s'] * len(pks))), pks)
+
+
+class Command(BaseCommand):
+    help = 'Purge rows of risk models marked as deleted, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--time-limit', type=float, default=None,
+                            help='Stop after the batch running when this many seconds have passed, '
+                                 'the rest is purged on the next run')
+
+    def handle(self, *args, **options):
+        deadline = time.monotonic() + options['time_limit'] if options['time_limit'] else None
+
+        for risk_model in RiskModel.all_objects.filter(deleted__isnull=False).order_by('deleted'):
+            if not self.purge_risk_model(risk_model, options['batch_size'], deadline):
+                self.stdout.write('Time limit reached, run again to continue')
+                return
+
+    def purge_risk_model(self, risk_model, batch_size, deadline=None):
+        """
+        Delete rows referencing `risk_model` from the bottom up, each batch in its own transaction.
+        Return False if `deadline` is reached before everything is deleted.
+        """
+        querysets = [
+            ('values', RiskModelObjectValue.objects.filter(risk_object__risk_model=risk_model)),
+            ('projections', RiskModelObjectProjection.objects.filter(risk_object__risk_model=risk_model)),
+            ('objects', RiskModelObject.objects.filter(risk_model=risk_model)),
+            ('fields', RiskModelField.objects.filter(risk_model=risk_model)),
+            ('imports', RiskModelImport.objects.filter(risk_model=risk_model)),
+        ]
+
+        for name, queryset in querysets:
+            total = queryset.count()
+            purged = 0
+            while True:
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+
+                pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+
+                with transaction.atomic():
+                    _raw_delete(queryset.model, pks)
+
+                purged += len(pks)
+                self.stdout.write('Purged {purged}/{total} {name} of {model} ({uuid})'.format(
+                    purged=purged, total=total, name=name, model=risk_model, uuid=risk_model.uuid))
+
+        with transaction.atomic():
+            RiskModelField.delete_field_id_sequence(risk_model.id)
+            _raw_delete(RiskModel, [risk_model.pk])
+
+        self.stdout.write(self.style.SUCCESS('Purged {model} ({uuid})'.format(model=risk_model, uuid=risk_model.uuid)))
+        return True
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+
+from app.api.db import query_param_batches
+from app.risk.models import RiskModel, RiskModelField, RiskModelObject, RiskModelObjectProjection
+
+
+class Command(BaseCommand):
+    help = 'Rebuild flattened projections of objects from their values'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_uuid', nargs='*', help='Only rebuild objects of these models')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        risk_models = RiskModel.objects.all()
+        if options['model_uuid']:
+            risk_models = risk_models.filter(uuid__in=options['model_uuid'])
+            if risk_models.count() != len(options['model_uuid']):
+                raise CommandError('Some of risk models are not found')
+
+        for risk_model in risk_models:
+            count = self.rebuild_risk_model(risk_model, options['chunk_size'])
+            self.stdout.write('Rebuilt {count} objects of {model}'.format(count=count, model=risk_model))
+
+    def rebuild_risk_model(self, risk_model, chunk_size):
+        risk_model_fields = list(RiskModelField.objects.filter(risk_model=risk_model))
+        field_slugs = {field.id: field.slug for field in risk_model_fields}
+
+        count = 0
+        last_id = 0
+        while True:
+            risk_objects = list(RiskModelObject.objects.filter(
+                risk_model=risk_model, id__gt=last_id).order_by('id')[:chunk_size])
+            if not risk_objects:
+                break
+
+            # Ids of a chunk may be more than parameters a query can have
+            risk_object_batches = list(query_param_batches(risk_objects, connection))
+            for risk_object_batch in risk_object_batches:
+                prefetch_related_objects(risk_object_batch, 'risk_values')
+
+            projections = [
+                RiskModelObjectProjection.from_values(risk_object.id, risk_model_fields, {
+                    field_slugs[object_value.field_id]: object_value.value
+                    for object_value in risk_object.risk_values.all()})
+                for risk_object in risk_objects]
+
+            with transaction.atomic():
+                for risk_object_batch in risk_object_batches:
+                    RiskModelObjectProjection.objects.filter(
+                        risk_object_id__in=[risk_object.id for risk_object in risk_object_batch]).delete()
+                RiskModelObjectProjection.objects.bulk_create(projections)
+
+            count += len(risk_objects)
+            last_id = risk_objects[-1].id
+
+        return count
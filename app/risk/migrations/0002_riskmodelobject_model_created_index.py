@@ -0,0 +1,17 @@
+# Generated by Django 2.0.2 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='riskmodelobject',
+            index=models.Index(fields=['risk_model', '-created'], name='risk_object_model_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.2 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0002_riskmodelobject_model_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='riskmodel',
+            name='schema_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.0.13 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0003_riskmodel_schema_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='riskmodelobjectvalue',
+            index=models.Index(fields=['field', 'value_number'], name='risk_value_field_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riskmodelobjectvalue',
+            index=models.Index(fields=['field', 'value_date'], name='risk_value_field_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riskmodelobjectvalue',
+            index=models.Index(fields=['field', 'value_enum'], name='risk_value_field_enum_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.0.13 on 2026-10-18 19:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0004_riskmodelobjectvalue_typed_value_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskModelObjectProjection',
+            fields=[
+                ('risk_object', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='projection', serialize=False, to='risk.RiskModelObject')),
+                ('values', models.TextField()),
+            ],
+        ),
+    ]
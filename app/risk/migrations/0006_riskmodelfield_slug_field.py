@@ -0,0 +1,19 @@
+# Generated by Django 2.0.13 on 2026-10-18 19:27
+
+import app.risk.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0005_riskmodelobjectprojection'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='riskmodelfield',
+            name='slug',
+            field=app.risk.models.FieldSlugField(blank=True, editable=False, populate_from=['name']),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.13 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0006_riskmodelfield_slug_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='riskmodel',
+            name='deleted',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
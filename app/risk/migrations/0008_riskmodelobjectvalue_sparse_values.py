@@ -0,0 +1,52 @@
+# Generated by Django 2.0.13 on 2026-10-18 19:37
+
+from django.db import migrations, transaction
+from django.db.models import Count, Max
+
+
+BATCH_SIZE = 500
+
+
+def compact_object_values(apps, schema_editor):
+    """
+    Delete stored null values, which are now read as null when missing, and duplicated values of
+    the same field that would break the unique index. Each batch is committed on its own, so a
+    large table is never locked for the whole migration.
+    """
+    RiskModelObjectValue = apps.get_model('risk', 'RiskModelObjectValue')
+    db_alias = schema_editor.connection.alias
+
+    null_values = RiskModelObjectValue.objects.using(db_alias).filter(
+        value_text__isnull=True, value_number__isnull=True, value_date__isnull=True, value_enum__isnull=True)
+    while True:
+        ids = list(null_values.values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        with transaction.atomic(using=db_alias):
+            RiskModelObjectValue.objects.using(db_alias).filter(id__in=ids).delete()
+
+    # Keep the latest value of each field of an object
+    duplicates = RiskModelObjectValue.objects.using(db_alias).values('risk_object_id', 'field_id').annotate(
+        count=Count('id'), last_id=Max('id')).filter(count__gt=1).order_by()
+    for duplicate in list(duplicates):
+        with transaction.atomic(using=db_alias):
+            RiskModelObjectValue.objects.using(db_alias).filter(
+                risk_object_id=duplicate['risk_object_id'], field_id=duplicate['field_id'],
+                id__lt=duplicate['last_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('risk', '0007_riskmodel_deleted'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_object_values, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='riskmodelobjectvalue',
+            unique_together={('risk_object', 'field')},
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+
+
+SEARCH_TABLE = 'risk_riskmodelobjectvalue_search'
+VALUES_TABLE = 'risk_riskmodelobjectvalue'
+
+# Index reads text and enum columns from values table itself (external content), and only rows
+# having one of them are indexed. Triggers must delete exactly what was indexed.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE {search} USING fts5("
+    "value_text, value_enum, content='{values}', content_rowid='id', prefix='2 3')",
+
+    "CREATE TRIGGER {search}_insert AFTER INSERT ON {values} "
+    "WHEN new.value_text IS NOT NULL OR new.value_enum IS NOT NULL BEGIN "
+    "INSERT INTO {search} (rowid, value_text, value_enum) VALUES (new.id, new.value_text, new.value_enum); "
+    "END",
+
+    "CREATE TRIGGER {search}_delete AFTER DELETE ON {values} "
+    "WHEN old.value_text IS NOT NULL OR old.value_enum IS NOT NULL BEGIN "
+    "INSERT INTO {search} ({search}, rowid, value_text, value_enum) "
+    "VALUES ('delete', old.id, old.value_text, old.value_enum); "
+    "END",
+
+    # One trigger, so old row is always removed from index before new one is added
+    "CREATE TRIGGER {search}_update AFTER UPDATE OF value_text, value_enum ON {values} BEGIN "
+    "INSERT INTO {search} ({search}, rowid, value_text, value_enum) "
+    "SELECT 'delete', old.id, old.value_text, old.value_enum "
+    "WHERE old.value_text IS NOT NULL OR old.value_enum IS NOT NULL; "
+    "INSERT INTO {search} (rowid, value_text, value_enum) "
+    "SELECT new.id, new.value_text, new.value_enum "
+    "WHERE new.value_text IS NOT NULL OR new.value_enum IS NOT NULL; "
+    "END",
+
+    "INSERT INTO {search} (rowid, value_text, value_enum) "
+    "SELECT id, value_text, value_enum FROM {values} WHERE value_text IS NOT NULL OR value_enum IS NOT NULL",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS {search}_insert',
+    'DROP TRIGGER IF EXISTS {search}_delete',
+    'DROP TRIGGER IF EXISTS {search}_update',
+    'DROP TABLE IF EXISTS {search}',
+]
+
+
+def _has_fts5(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def _execute(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql.format(search=SEARCH_TABLE, values=VALUES_TABLE))
+
+
+def create_search_table(apps, schema_editor):
+    """
+    Full-text index of text and enum values on SQLite, other databases search without it
+    """
+    if _has_fts5(schema_editor):
+        _execute(schema_editor, CREATE_SQL)
+
+
+def drop_search_table(apps, schema_editor):
+    if _has_fts5(schema_editor):
+        _execute(schema_editor, DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0008_riskmodelobjectvalue_sparse_values'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
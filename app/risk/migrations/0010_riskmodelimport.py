@@ -0,0 +1,27 @@
+# Generated by Django 2.0.13 on 2026-10-18 20:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk', '0009_riskmodelobjectvalue_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskModelImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checksum', models.CharField(max_length=40)),
+                ('rows_done', models.PositiveIntegerField(default=0)),
+                ('risk_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imports', to='risk.RiskModel')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='riskmodelimport',
+            unique_together={('risk_model', 'checksum')},
+        ),
+    ]
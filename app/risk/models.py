@@ -1,24 +1,48 @@
+import json
 import uuid
+from collections import OrderedDict, defaultdict, namedtuple
 from enum import Enum
 
-from django.db import models
-from django.db.models import Q
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.db.models import Avg, Case, Count, Max, Min, Prefetch, Q, Sum, Value, When, prefetch_related_objects
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 from django_extensions.db.fields import AutoSlugField
 
-from dateutil.parser import parse
 from functools import reduce
 from sequences import get_next_value
+from sequences.models import Sequence
 
+from app.api.db import query_param_batches
 from app.api.models import SerializableMixin
+from app.risk.dates import parse_date
+from app.risk.search import SEARCH_TABLE, search_terms, to_match_query, to_word_prefix_regex, uses_search_table
 
 
 # Risk models
 # -------------------------------------
 
+class RiskModelManager(models.Manager):
+    """
+    Models marked as deleted are left out, their rows are purged later by `purge_deleted_models`
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted__isnull=True)
+
+
 class RiskModel(SerializableMixin, models.Model):
     uuid = models.UUIDField(db_index=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=64)
     created = models.DateTimeField(auto_now_add=True)
+    deleted = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+
+    # Increased every time fields are updated, used to invalidate anything compiled from fields
+    schema_version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = RiskModelManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ('-created', )
@@ -26,6 +50,14 @@ class RiskModel(SerializableMixin, models.Model):
     def __str__(self):
         return self.name
 
+    def mark_deleted(self):
+        """
+        Hide the model right away without touching its objects and values, which may be far too
+        many to delete within a request
+        """
+        self.deleted = timezone.now()
+        self.save(update_fields=['deleted'])
+
     def to_dict(self):
         fields = [field.to_dict() for field in self.fields.all()]
         return {
@@ -61,8 +93,8 @@ class FieldType(Enum):
             return int(naive_value)
 
         elif self == FieldType.DATE:
-            # Note: parse will throw ValueError if parsing error
-            return parse(naive_value)
+            # Note: parse_date will throw ValueError if parsing error
+            return parse_date(naive_value)
 
         elif self == FieldType.ENUM:
             enum_value = str(naive_value)
@@ -74,15 +106,43 @@ class FieldType(Enum):
         return None
 
 
+class FieldSlugField(AutoSlugField):
+    """
+    `AutoSlugField` that keeps slug of a new field when it's already resolved by
+    `RiskModelField.resolve_slugs`, so it doesn't look up database for a unique slug again
+    """
+    def pre_save(self, model_instance, add):
+        if add and getattr(model_instance, '_slug_resolved', False):
+            return getattr(model_instance, self.attname)
+        return super().pre_save(model_instance, add)
+
+
+class RiskModelFieldManager(models.Manager):
+    def bulk_update_fields(self, risk_model_fields, field_names):
+        """
+        Save `field_names` of many existing `RiskModelField` with one UPDATE
+        """
+        risk_model_fields = list(risk_model_fields)
+        if not risk_model_fields or not field_names:
+            return
+
+        self.get_queryset().filter(id__in=[field.id for field in risk_model_fields]).update(**{
+            field_name: Case(*[When(id=field.id, then=Value(getattr(field, field_name)))
+                               for field in risk_model_fields], output_field=self.model._meta.get_field(field_name))
+            for field_name in field_names})
+
+
 class RiskModelField(SerializableMixin, models.Model):
     risk_model = models.ForeignKey(RiskModel, related_name='fields', on_delete=models.CASCADE)
     field_id = models.PositiveIntegerField()
-    slug = AutoSlugField(populate_from=['name'], editable=True, db_index=True)
+    slug = FieldSlugField(populate_from=['name'], editable=True, db_index=True)
     is_required = models.BooleanField(default=False)
     name = models.CharField(max_length=128)
     type = models.CharField(max_length=64, choices=FieldType.to_choices())
     choices = models.TextField(null=True, blank=True)
 
+    objects = RiskModelFieldManager()
+
     class Meta:
         unique_together = ('risk_model', 'slug')
 
@@ -103,12 +163,66 @@ class RiskModelField(SerializableMixin, models.Model):
 
         return ret
 
+    @staticmethod
+    def _field_id_sequence_name(risk_model_id):
+        return 'risk_model_{}'.format(risk_model_id)
+
+    @classmethod
+    def reserve_field_ids(cls, risk_model_id, count):
+        """
+        Reserve `count` consecutive values of model's `field_id` sequence at once, rather than
+        calling `get_next_value` for each new field. Returns range of reserved values.
+        """
+        with transaction.atomic(savepoint=False):
+            sequence, created = Sequence.objects.select_for_update().get_or_create(
+                name=cls._field_id_sequence_name(risk_model_id), defaults={'last': count})
+            if not created:
+                sequence.last += count
+                sequence.save(update_fields=['last'])
+
+        return range(sequence.last - count + 1, sequence.last + 1)
+
+    @classmethod
+    def delete_field_id_sequence(cls, risk_model_id):
+        Sequence.objects.filter(name=cls._field_id_sequence_name(risk_model_id)).delete()
+
+    @classmethod
+    def resolve_slugs(cls, new_fields, taken_slugs):
+        """
+        Set unique slugs of new fields from their names the same way `AutoSlugField` does
+        (`name`, `name-2`, `name-3`...), checking against `taken_slugs` of the model in memory
+        instead of one query per candidate.
+        """
+        slug_field = cls._meta.get_field('slug')
+        max_length = slug_field.max_length
+        taken_slugs = set(taken_slugs)
+
+        for field in new_fields:
+            original_slug = slug_field._slug_strip(slug_field.slugify_func(field.name)[:max_length])
+            slug = original_slug
+            index = 1
+            while not slug or slug in taken_slugs:
+                index += 1
+                end = '{separator}{index}'.format(separator=slug_field.separator, index=index)
+                slug = original_slug
+                if len(slug) + len(end) > max_length:
+                    slug = slug_field._slug_strip(slug[:max_length - len(end)])
+                slug += end
+
+            field.slug = slug
+            field._slug_resolved = True
+            taken_slugs.add(slug)
+
     def save(self, **kwargs):
         if not self.field_id:
-            self.field_id = get_next_value('risk_model_{}'.format(self.risk_model.id))
+            self.field_id = get_next_value(self._field_id_sequence_name(self.risk_model.id))
         super().save(**kwargs)
 
 
+# Objects with their values or projections and slugs of their fields, see `RiskModelObject.fetch_values`
+FetchedValues = namedtuple('FetchedValues', ['risk_objects', 'field_slugs', 'projected_slugs', 'projections'])
+
+
 class RiskModelObject(SerializableMixin, models.Model):
     uuid = models.UUIDField(db_index=True, default=uuid.uuid4, editable=False)
     risk_model = models.ForeignKey(RiskModel, related_name='risk_objects', on_delete=models.CASCADE)
@@ -116,17 +230,176 @@ class RiskModelObject(SerializableMixin, models.Model):
 
     class Meta:
         ordering = ('-created', )
+        indexes = [
+            models.Index(fields=['risk_model', '-created'], name='risk_object_model_created_idx'),
+        ]
 
     def __str__(self):
         return '{model_name} object #{uuid}'.format(model_name=self.risk_model, uuid=self.uuid)
 
-    def to_dict(self):
+    def to_dict(self, field_slugs=None, object_values=None, omit_empty=False):
+        """
+        `field_slugs` is a mapping of field's id to its slug, read from database if not given.
+        Values are read from `risk_values` (prefetched by `fetch_values`), or from `object_values`
+        if they are already in memory.
+
+        Only present values are stored, fields without a value are null, or left out when `omit_empty`.
+        """
         dict = {
             'uuid': self.uuid,
             'created': self.created,
         }
-        for object_value in self.risk_values.all().select_related('field'):
-            dict[object_value.field.slug] = object_value.value
+
+        if field_slugs is None:
+            field_slugs = OrderedDict(RiskModelField.objects.filter(
+                risk_model_id=self.risk_model_id).order_by('field_id').values_list('id', 'slug'))
+
+        if not omit_empty:
+            dict.update((slug, None) for slug in field_slugs.values())
+
+        if object_values is None:
+            object_values = self.risk_values.all()
+
+        for object_value in object_values:
+            if object_value.field_id in field_slugs and (not omit_empty or object_value.value is not None):
+                dict[field_slugs[object_value.field_id]] = object_value.value
+
+        return dict
+
+    @classmethod
+    def bulk_create_with_values(cls, risk_model, risk_model_fields, validated_objects):
+        """
+        Create an object of `risk_model` for each of `validated_objects` (validated data keyed by
+        field's slug) with their values, and projections when `RISK_OBJECT_PROJECTION` is on.
+        Inserts are batched, so call it with chunks of a size that fits in memory.
+        """
+        risk_objects = [cls(risk_model=risk_model) for _ in validated_objects]
+        cls.objects.bulk_create(risk_objects)
+
+        # Not every database backend returns primary keys from bulk insert, look them up by uuid
+        object_ids = {}
+        for uuids in query_param_batches(
+                [risk_object.uuid for risk_object in risk_objects], connections[cls.objects.db]):
+            object_ids.update(cls.objects.filter(uuid__in=uuids).values_list('uuid', 'id'))
+        for risk_object in risk_objects:
+            risk_object.id = object_ids[risk_object.uuid]
+
+        object_values = []
+        for risk_object, validated_data in zip(risk_objects, validated_objects):
+            object_values.extend(RiskModelObjectValue.from_validated_data(
+                risk_object.id, risk_model_fields, validated_data))
+        RiskModelObjectValue.objects.bulk_create(object_values)
+
+        if settings.RISK_OBJECT_PROJECTION:
+            RiskModelObjectProjection.objects.bulk_create([
+                RiskModelObjectProjection.from_values(risk_object.id, risk_model_fields, validated_data)
+                for risk_object, validated_data in zip(risk_objects, validated_objects)])
+
+        return risk_objects
+
+    @classmethod
+    def fetch_values(cls, risk_objects, fields=None):
+        """
+        Read everything `to_dict_list` needs to serialize many objects at once, using two queries,
+        one for all values (or their projections) and one for field slugs, instead of one query
+        per object.
+
+        `fields` limits values to these `RiskModelField`s, then only values of them are read (with
+        an `IN` on field id) and field slugs don't need a query.
+        """
+        risk_objects = list(risk_objects)
+        if not risk_objects:
+            return FetchedValues(risk_objects, {}, {}, {})
+
+        if fields is None:
+            risk_model_ids = {risk_object.risk_model_id for risk_object in risk_objects}
+            field_rows = RiskModelField.objects.filter(risk_model_id__in=risk_model_ids).order_by(
+                'field_id').values_list('id', 'risk_model_id', 'field_id', 'slug')
+            values_queryset = None
+        else:
+            field_rows = [(field.id, field.risk_model_id, field.field_id, field.slug) for field in fields]
+            values_queryset = RiskModelObjectValue.objects.filter(field_id__in=[field.id for field in fields])
+
+        # Slugs of each model are kept apart, so objects are not filled with null values of other models' fields
+        field_slugs = defaultdict(OrderedDict)
+        projected_slugs = {}
+        for field_pk, risk_model_id, field_id, slug in field_rows:
+            field_slugs[risk_model_id][field_pk] = slug
+            projected_slugs[(risk_model_id, field_id)] = slug
+
+        projections = {}
+        if settings.RISK_OBJECT_PROJECTION:
+            projections = RiskModelObjectProjection.objects.in_bulk(
+                [risk_object.id for risk_object in risk_objects])
+
+        # Objects created before projection was enabled are read from their values. Their ids are
+        # sent in batches, so a whole model (`limit=0`) fits in the parameters of a query.
+        for risk_objects_batch in query_param_batches(
+                [risk_object for risk_object in risk_objects if risk_object.id not in projections],
+                connections[cls.objects.db], reserved=len(fields) if fields is not None else 0):
+            prefetch_related_objects(risk_objects_batch, Prefetch('risk_values', queryset=values_queryset))
+
+        return FetchedValues(risk_objects, field_slugs, projected_slugs, projections)
+
+    @classmethod
+    def to_dict_list(cls, fetched_values, omit_empty=False):
+        """
+        Serialize objects from `FetchedValues` read by `fetch_values`, without any query
+        """
+        risk_objects, field_slugs, projected_slugs, projections = fetched_values
+        return [
+            projections[risk_object.id].to_dict(risk_object, projected_slugs, omit_empty=omit_empty)
+            if risk_object.id in projections
+            else risk_object.to_dict(field_slugs=field_slugs[risk_object.risk_model_id], omit_empty=omit_empty)
+            for risk_object in risk_objects]
+
+
+class RiskModelObjectProjection(models.Model):
+    """
+    Values of an object flattened into one JSON row, which is faster to read than pivoting one
+    `RiskModelObjectValue` per field. Only used when `RISK_OBJECT_PROJECTION` setting is on,
+    `RiskModelObjectValue` is still the source of truth.
+
+    Values are keyed by field's `field_id` rather than slug. `field_id` is never reused in a model,
+    so renaming or deleting fields doesn't require rewriting projections.
+    """
+    risk_object = models.OneToOneField(
+        RiskModelObject, primary_key=True, related_name='projection', on_delete=models.CASCADE)
+    values = models.TextField()
+
+    def __str__(self):
+        return 'Projection of {}'.format(self.risk_object_id)
+
+    @classmethod
+    def from_values(cls, risk_object_id, risk_model_fields, values):
+        """
+        `values` is a mapping of field's slug to its value
+        """
+        return cls(risk_object_id=risk_object_id, values=json.dumps(
+            {str(field.field_id): values.get(field.slug) for field in risk_model_fields}, cls=DjangoJSONEncoder))
+
+    def to_dict(self, risk_object, projected_slugs, omit_empty=False):
+        """
+        `projected_slugs` is a mapping of `(risk_model_id, field_id)` to field's slug, values of
+        fields not in it are left out
+        """
+        dict = {
+            'uuid': risk_object.uuid,
+            'created': risk_object.created,
+        }
+
+        # Fields added after projection was saved have no value yet
+        if not omit_empty:
+            dict.update((slug, None) for (risk_model_id, _), slug in projected_slugs.items()
+                        if risk_model_id == risk_object.risk_model_id)
+
+        for field_id, value in json.loads(self.values).items():
+            if omit_empty and value is None:
+                continue
+
+            slug = projected_slugs.get((risk_object.risk_model_id, int(field_id)))
+            if slug:
+                dict[slug] = value
 
         return dict
 
@@ -153,7 +426,7 @@ class RiskModelObjectValueManager(models.Manager):
 
             # Date value
             try:
-                date_value = parse(attr_value)
+                date_value = parse_date(attr_value)
             except:
                 pass
             else:
@@ -165,6 +438,116 @@ class RiskModelObjectValueManager(models.Manager):
         args = new_args
         return super().filter(*args, **kwargs)
 
+    def field_stats(self, risk_objects, risk_model_fields):
+        """
+        Statistics of values of `risk_objects` (a queryset), keyed by field's slug. There's one
+        grouped query per typed value column:
+        - number: count, min, max, avg and sum
+        - date: count, min, max and monthly histogram
+        - enum: count and frequency of each choice
+        - text: count
+        """
+        fields_by_type = defaultdict(dict)
+        for field in risk_model_fields:
+            fields_by_type[field.type][field.id] = field
+
+        stats = {field.slug: {'type': field.type, 'count': 0} for field in risk_model_fields}
+
+        def grouped_values(field_type, *group_by, **group_by_expressions):
+            column = 'value_{}'.format(field_type)
+            return self.get_queryset().filter(**{
+                'risk_object__in': risk_objects,
+                'field__in': list(fields_by_type[field_type]),
+                '{}__isnull'.format(column): False,
+            }).annotate(**group_by_expressions).values('field_id', *group_by, *group_by_expressions).order_by()
+
+        if fields_by_type[FieldType.NUMBER.value]:
+            for row in grouped_values(FieldType.NUMBER.value).annotate(
+                    count=Count('id'), min=Min('value_number'), max=Max('value_number'),
+                    avg=Avg('value_number'), sum=Sum('value_number')):
+                field = fields_by_type[FieldType.NUMBER.value][row.pop('field_id')]
+                stats[field.slug].update(row)
+
+        if fields_by_type[FieldType.DATE.value]:
+            for field in fields_by_type[FieldType.DATE.value].values():
+                stats[field.slug].update({'min': None, 'max': None, 'histogram': []})
+
+            for row in grouped_values(FieldType.DATE.value, month=TruncMonth('value_date')).annotate(
+                    count=Count('id'), min=Min('value_date'), max=Max('value_date')).order_by('month'):
+                field_stats = stats[fields_by_type[FieldType.DATE.value][row['field_id']].slug]
+                field_stats['count'] += row['count']
+                # Rows are ordered by month, so the first one has the minimum and the last one the maximum
+                field_stats['min'] = field_stats['min'] or row['min']
+                field_stats['max'] = row['max']
+                field_stats['histogram'].append({'month': row['month'], 'count': row['count']})
+
+        if fields_by_type[FieldType.ENUM.value]:
+            for field in fields_by_type[FieldType.ENUM.value].values():
+                stats[field.slug]['frequencies'] = {}
+
+            for row in grouped_values(FieldType.ENUM.value, 'value_enum').annotate(count=Count('id')):
+                field_stats = stats[fields_by_type[FieldType.ENUM.value][row['field_id']].slug]
+                field_stats['count'] += row['count']
+                field_stats['frequencies'][row['value_enum']] = row['count']
+
+        if fields_by_type[FieldType.TEXT.value]:
+            for row in grouped_values(FieldType.TEXT.value).annotate(count=Count('id')):
+                stats[fields_by_type[FieldType.TEXT.value][row['field_id']].slug]['count'] = row['count']
+
+        return stats
+
+    def search_objects(self, risk_model_fields, query, limit):
+        """
+        Ids of objects having a text or enum value (of `risk_model_fields`) that matches every word
+        of `query` as a word prefix, best matches first, at most `limit` of them.
+
+        With the full-text index, an object is as good as its best matching value (bm25). Without
+        it, objects with more matching values come first.
+        """
+        terms = search_terms(query)
+        field_ids = [field.id for field in risk_model_fields
+                     if field.type in (FieldType.TEXT.value, FieldType.ENUM.value)]
+        if not terms or not field_ids:
+            return []
+
+        connection = connections[self.db]
+        if uses_search_table(connection):
+            sql = ('SELECT value.risk_object_id FROM {search} '
+                   'JOIN {values} value ON value.id = {search}.rowid '
+                   'WHERE {search} MATCH %s AND value.field_id IN ({field_params}) '
+                   'GROUP BY value.risk_object_id ORDER BY MIN({search}.rank), value.risk_object_id '
+                   'LIMIT %s').format(
+                search=SEARCH_TABLE,
+                values=connection.ops.quote_name(self.model._meta.db_table),
+                field_params=', '.join(['%s'] * len(field_ids)))
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [to_match_query(terms)] + field_ids + [limit])
+                return [row[0] for row in cursor.fetchall()]
+
+        condition = Q()
+        for term in terms:
+            term_regex = to_word_prefix_regex(term)
+            condition &= Q(value_text__iregex=term_regex) | Q(value_enum__iregex=term_regex)
+
+        rows = self.get_queryset().filter(condition, field_id__in=field_ids).values('risk_object_id').annotate(
+            matches=Count('id')).order_by('-matches', 'risk_object_id')[:limit]
+        return [row['risk_object_id'] for row in rows]
+
+    def bulk_update_values(self, object_values):
+        """
+        Save values of many existing `RiskModelObjectValue` with one UPDATE per typed value column,
+        only columns of the given values are written.
+        """
+        values_by_column = defaultdict(list)
+        for object_value in object_values:
+            values_by_column['value_{}'.format(object_value.field_type)].append(object_value)
+
+        for column, column_values in values_by_column.items():
+            output_field = self.model._meta.get_field(column)
+            self.get_queryset().filter(id__in=[object_value.id for object_value in column_values]).update(**{
+                column: Case(*[When(id=object_value.id, then=Value(getattr(object_value, column)))
+                               for object_value in column_values], output_field=output_field)})
+
 
 class RiskModelObjectValue(models.Model):
     risk_object = models.ForeignKey(RiskModelObject, related_name='risk_values', on_delete=models.CASCADE)
@@ -179,9 +562,28 @@ class RiskModelObjectValue(models.Model):
 
     objects = RiskModelObjectValueManager()
 
+    class Meta:
+        unique_together = ('risk_object', 'field')
+        indexes = [
+            models.Index(fields=['field', 'value_number'], name='risk_value_field_number_idx'),
+            models.Index(fields=['field', 'value_date'], name='risk_value_field_date_idx'),
+            models.Index(fields=['field', 'value_enum'], name='risk_value_field_enum_idx'),
+        ]
+
     def __str__(self):
         return '{value} ({field})'.format(value=self.value, field=self.field)
 
+    @classmethod
+    def from_validated_data(cls, risk_object_id, risk_model_fields, validated_data):
+        """
+        Values of fields present in `validated_data`, missing values are not stored but read as null
+        """
+        return [cls(
+            risk_object_id=risk_object_id,
+            field=field,
+            field_type=field.type,
+            value=validated_data[field.slug]) for field in risk_model_fields if validated_data.get(field.slug) is not None]
+
     def _get_value(self):
         try:
             return getattr(self, 'value_{}'.format(self.field_type))
@@ -195,3 +597,20 @@ class RiskModelObjectValue(models.Model):
             pass
 
     value = property(_get_value, _set_value)
+
+
+class RiskModelImport(models.Model):
+    """
+    Rows of a CSV file (identified by its checksum) done by `import_objects`, saved in the same
+    transaction as the objects they created, so an interrupted import goes on from there and a
+    finished one isn't imported twice
+    """
+    risk_model = models.ForeignKey(RiskModel, related_name='imports', on_delete=models.CASCADE)
+    checksum = models.CharField(max_length=40)
+    rows_done = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('risk_model', 'checksum')
+
+    def __str__(self):
+        return 'Import {checksum} into {model_name}'.format(checksum=self.checksum, model_name=self.risk_model)
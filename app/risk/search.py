@@ -0,0 +1,54 @@
+"""
+Full-text search of text and enum values.
+
+On SQLite, values are indexed in FTS5 table `SEARCH_TABLE`, which triggers of the values table
+keep in sync (see migration `0009_riskmodelobjectvalue_search`), so bulk inserts, updates and raw
+deletes are indexed too. Other databases, or SQLite built without FTS5, fall back to a
+case-insensitive regular expression of every term, which matches words the same way.
+"""
+import re
+import sqlite3
+from functools import lru_cache
+
+
+SEARCH_TABLE = 'risk_riskmodelobjectvalue_search'
+
+TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """
+    Words of a search query, anything else (quotes, operators...) is dropped
+    """
+    return TERM_RE.findall(query.lower())
+
+
+def to_match_query(terms):
+    """
+    FTS5 query matching values with every term as prefix of one of their words
+    """
+    return ' '.join('"{}"*'.format(term) for term in terms)
+
+
+def to_word_prefix_regex(term):
+    """
+    Regular expression matching values with `term` as prefix of one of their words, like a term of
+    `to_match_query`. Terms only have word characters, so they need no escaping.
+    """
+    return r'(^|\W){}'.format(term)
+
+
+@lru_cache(maxsize=None)
+def fts5_available():
+    """
+    Whether SQLite library Python is linked with has FTS5 extension
+    """
+    sqlite_connection = sqlite3.connect(':memory:')
+    try:
+        return ('ENABLE_FTS5',) in sqlite_connection.execute('PRAGMA compile_options').fetchall()
+    finally:
+        sqlite_connection.close()
+
+
+def uses_search_table(connection):
+    return connection.vendor == 'sqlite' and fts5_available()
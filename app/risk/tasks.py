@@ -0,0 +1,12 @@
+from django.core.management import call_command
+
+
+# Lambda functions time out after 30 seconds, leave time for the batch that is running
+PURGE_TIME_LIMIT = 20
+
+
+def purge_deleted_models(event, context):
+    """
+    Run periodically by `events` of `zappa_settings.json`, each run continues where the last one stopped
+    """
+    call_command('purge_deleted_models', time_limit=PURGE_TIME_LIMIT)
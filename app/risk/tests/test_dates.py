@@ -0,0 +1,56 @@
+import pytest
+from dateutil.parser import parse
+
+from app.risk import dates
+from app.risk.dates import parse_date
+
+
+@pytest.mark.parametrize('value', [
+    '2016-12-01',
+    '2016-12-01T10:20',
+    '2016-12-01 10:20:30',
+    '2016-12-01T10:20:30.5',
+    '2016-12-01T10:20:30+07:00',
+    '1 Dec 2016',
+    '12/01/2016',
+])
+def test_parse_date_same_as_dateutil(value):
+    """
+    Test ISO dates parsed directly and other formats parsed by dateutil give the same result as dateutil
+    """
+    assert parse_date(value) == parse(value)
+    # Again from cache
+    assert parse_date(value) == parse(value)
+
+
+@pytest.mark.parametrize('value', ['2017-02-30', 'Toyota', '', 2016, None])
+def test_parse_date_invalid(value):
+    with pytest.raises((ValueError, TypeError)):
+        parse_date(value)
+    with pytest.raises((ValueError, TypeError)):
+        parse_date(value)
+
+
+def test_parse_date_dateutil_calls(monkeypatch):
+    """
+    Test a non-ISO date is parsed by dateutil once per call, and an ISO date never
+    """
+    dateutil_values = []
+
+    def counting_dateutil_parse(value):
+        dateutil_values.append(value)
+        return parse(value)
+
+    monkeypatch.setattr(dates, '_dateutil_parse', counting_dateutil_parse)
+
+    assert parse_date('2 Jan 2017') == parse('2 Jan 2017')
+    assert dateutil_values == ['2 Jan 2017']
+
+    assert parse_date('2017-01-02') == parse('2017-01-02')
+    assert dateutil_values == ['2 Jan 2017']
+
+    # Failure is cached
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            parse_date('Not a date')
+    assert dateutil_values == ['2 Jan 2017', 'Not a date']
@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+from app.risk.models import RiskModelField, FieldType
+
+
+class RiskModelValidator:
+    """
+    Validator of object values compiled from fields of a risk model.
+
+    Everything that doesn't depend on submitted data (field list, converter of each field type,
+    enum choices) is prepared once, so validating a request needs no database query.
+    """
+    def __init__(self, risk_model_fields):
+        self.fields = tuple(risk_model_fields)
+        self.fields_by_slug = {field.slug: field for field in self.fields}
+        self.projected_slugs = {(field.risk_model_id, field.field_id): field.slug for field in self.fields}
+        self.required_slugs = frozenset(field.slug for field in self.fields if field.is_required)
+        self._converters = tuple((field.slug, self._compile_converter(field)) for field in self.fields)
+        self._converters_by_slug = dict(self._converters)
+
+    @staticmethod
+    def _compile_converter(field):
+        field_type = FieldType(field.type)
+
+        if field_type == FieldType.ENUM:
+            enum_choices = frozenset((field.choices or '').split(','))
+            return lambda naive_value: field_type.to_valid_value(naive_value, enum_choices=enum_choices)
+
+        if field_type == FieldType.DATE:
+            # Value is kept in `DateField`, drop time part so it can be compared with saved values
+            return lambda naive_value: field_type.to_valid_value(naive_value).date()
+
+        return field_type.to_valid_value
+
+    def to_valid_value(self, slug, naive_value):
+        """
+        Convert value of field `slug`, raise ValueError or TypeError if it is invalid
+        """
+        return self._converters_by_slug[slug](naive_value)
+
+    def validate(self, data, check_required=True):
+        validated_data = {}
+        errors = {}
+
+        for slug, converter in self._converters:
+            value = data.get(slug)
+            if not value:
+                if check_required and slug in self.required_slugs:
+                    errors[slug] = 'This field is required'
+                continue
+
+            try:
+                validated_data[slug] = converter(value)
+            except (ValueError, TypeError):
+                errors[slug] = 'This field is invalid'
+
+        return validated_data, errors
+
+
+_validators = OrderedDict()
+_validators_lock = threading.Lock()
+
+VALIDATOR_CACHE_SIZE = 256
+
+
+def get_validator(risk_model):
+    """
+    Return compiled validator of `risk_model`, cached by model and its `schema_version`.
+    Updating fields increases `schema_version`, so an outdated validator is never returned.
+
+    Cache key is model's `uuid` rather than `id` because database may reuse `id` of deleted model.
+    """
+    with _validators_lock:
+        cached = _validators.get(risk_model.uuid)
+        if cached and cached[0] == risk_model.schema_version:
+            _validators.move_to_end(risk_model.uuid)
+            return cached[1]
+
+    validator = RiskModelValidator(RiskModelField.objects.filter(risk_model=risk_model).order_by('field_id'))
+
+    with _validators_lock:
+        _validators[risk_model.uuid] = (risk_model.schema_version, validator)
+        _validators.move_to_end(risk_model.uuid)
+        while len(_validators) > VALIDATOR_CACHE_SIZE:
+            _validators.popitem(last=False)
+
+    return validator
@@ -0,0 +1,283 @@
+"""
+Benchmark risk API endpoints against a seeded portfolio on a local SQLite database
+
+    python -m benchmarks.api --fields 100 --objects 10000 --output results.json
+    python -m benchmarks.api --fields 100 --objects 10000 --compare results.json
+
+Every scenario is timed end to end through Django test client, recording wall time and number of
+database queries. Results are saved as JSON, and `--compare` reports scenarios that got slower.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import django
+
+
+SCENARIOS = OrderedDict()
+
+
+def scenario(name):
+    """
+    Register a scenario. Scenario function prepares anything it needs, then returns a function
+    doing the request to be timed.
+    """
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+class BenchmarkContext:
+    def __init__(self, risk_model, object_uuids, seed):
+        from app.risk.models import RiskModelField
+
+        self.risk_model = risk_model
+        self.risk_model_fields = list(RiskModelField.objects.filter(risk_model=risk_model).order_by('field_id'))
+        self.object_uuids = object_uuids
+        self.rand = random.Random(seed)
+
+    def random_object_uuid(self):
+        return self.rand.choice(self.object_uuids)
+
+    def random_object_data(self):
+        from benchmarks.fixtures import generate_object_data
+        return generate_object_data(self.risk_model_fields, self.rand)
+
+
+def _json_request(client, method, url, data):
+    return getattr(client, method)(url, json.dumps(data), content_type='application/json')
+
+
+@scenario('model_detail')
+def model_detail(client, context):
+    from django.core.cache import cache
+    from django.urls import reverse
+
+    cache.clear()
+    url = reverse('risk_api:model-detail', args=[context.risk_model.uuid])
+    return lambda: client.get(url)
+
+
+@scenario('model_detail_cached')
+def model_detail_cached(client, context):
+    from django.urls import reverse
+
+    url = reverse('risk_api:model-detail', args=[context.risk_model.uuid])
+    client.get(url)
+    return lambda: client.get(url)
+
+
+@scenario('object_list')
+def object_list(client, context):
+    from django.urls import reverse
+
+    url = reverse('risk_api:object-list', args=[context.risk_model.uuid])
+    return lambda: client.get(url)
+
+
+@scenario('object_list_last_page')
+def object_list_last_page(client, context):
+    from django.urls import reverse
+
+    url = reverse('risk_api:object-list', args=[context.risk_model.uuid])
+    last_page = max(1, (len(context.object_uuids) + 19) // 20)
+    return lambda: client.get(url, {'page': last_page})
+
+
+@scenario('object_search')
+def object_search(client, context):
+    from django.urls import reverse
+    from benchmarks.fixtures import TEXT_VALUES
+
+    url = reverse('risk_api:object-list', args=[context.risk_model.uuid])
+    return lambda: client.get(url, {'q': '{} 12'.format(context.rand.choice(TEXT_VALUES)[:4])})
+
+
+@scenario('object_detail')
+def object_detail(client, context):
+    from django.urls import reverse
+
+    url = reverse('risk_api:object-detail', args=[context.random_object_uuid()])
+    return lambda: client.get(url)
+
+
+@scenario('object_create')
+def object_create(client, context):
+    from django.urls import reverse
+
+    url = reverse('risk_api:object-list', args=[context.risk_model.uuid])
+    data = context.random_object_data()
+    return lambda: _json_request(client, 'post', url, data)
+
+
+@scenario('object_update')
+def object_update(client, context):
+    from django.urls import reverse
+
+    url = reverse('risk_api:object-detail', args=[context.random_object_uuid()])
+    data = context.random_object_data()
+    return lambda: _json_request(client, 'put', url, data)
+
+
+@scenario('object_delete')
+def object_delete(client, context):
+    from django.urls import reverse
+
+    response = _json_request(
+        client, 'post', reverse('risk_api:object-list', args=[context.risk_model.uuid]), context.random_object_data())
+    url = reverse('risk_api:object-detail', args=[json.loads(response.content)['uuid']])
+    return lambda: client.delete(url)
+
+
+@scenario('schema_edit')
+def schema_edit(client, context):
+    from django.urls import reverse
+
+    fields = [field.to_dict() for field in context.risk_model_fields]
+    renamed_field = context.rand.choice(fields)
+    renamed_field['name'] = '{} {}'.format(renamed_field['name'].split(' #')[0], '#{}'.format(time.time()))
+
+    url = reverse('risk_api:model-detail', args=[context.risk_model.uuid])
+    return lambda: _json_request(client, 'put', url, {'name': context.risk_model.name, 'fields': fields})
+
+
+def run_scenario(func, client, context, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    wall_times = []
+    query_counts = []
+    for _ in range(repeat):
+        request = func(client, context)
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            wall_times.append((time.perf_counter() - start) * 1000)
+
+        if response.status_code >= 400:
+            raise RuntimeError('Request failed with status {}: {}'.format(response.status_code, response.content[:200]))
+
+        query_counts.append(len(queries))
+
+    return OrderedDict([
+        ('wall_ms', OrderedDict([
+            ('min', round(min(wall_times), 3)),
+            ('median', round(statistics.median(wall_times), 3)),
+            ('max', round(max(wall_times), 3)),
+        ])),
+        ('queries', int(statistics.median(query_counts))),
+    ])
+
+
+def compare_results(previous, current, threshold):
+    """
+    Print change of median wall time and query count of each scenario, return names of those
+    that are slower than `threshold` times previous run or run more queries
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        previous_result = previous['results'].get(name)
+        if not previous_result:
+            continue
+
+        ratio = result['wall_ms']['median'] / max(previous_result['wall_ms']['median'], 0.001)
+        is_regression = ratio > threshold or result['queries'] > previous_result['queries']
+        if is_regression:
+            regressions.append(name)
+
+        print('{name:<24} {ratio:6.2f}x time  {previous_queries:>5} -> {queries:<5} queries {flag}'.format(
+            name=name, ratio=ratio, previous_queries=previous_result['queries'], queries=result['queries'],
+            flag='REGRESSION' if is_regression else ''))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fields', type=int, default=20, help='Number of fields of the risk model')
+    parser.add_argument('--objects', type=int, default=10000, help='Number of objects in the portfolio')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of times each scenario is run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS.keys()),
+                        help='Only run this scenario, can be given more than once')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'risk_model_benchmark.db'),
+                        help='SQLite database file, it is recreated unless --reuse-database is given')
+    parser.add_argument('--reuse-database', action='store_true',
+                        help='Use risk model already seeded in the database instead of creating a new one')
+    parser.add_argument('--output', help='Save results to this JSON file')
+    parser.add_argument('--compare', help='Compare results with previous results JSON file')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown ratio of median wall time reported as regression')
+    args = parser.parse_args(argv)
+
+    if not args.reuse_database and os.path.exists(args.database):
+        os.remove(args.database)
+
+    os.environ['DATABASE_URL'] = 'sqlite:///{}'.format(os.path.abspath(args.database))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+    django.setup()
+
+    from django.core.management import call_command
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from app.risk.models import RiskModel, RiskModelObject
+    from benchmarks.fixtures import generate_risk_model, generate_portfolio
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+
+    risk_model = RiskModel.objects.filter(name='Benchmark Portfolio').first() if args.reuse_database else None
+    if risk_model is None:
+        print('Seeding {} objects with {} fields...'.format(args.objects, args.fields))
+        start = time.perf_counter()
+        risk_model = generate_risk_model(args.fields, seed=args.seed)
+        generate_portfolio(risk_model, args.objects, seed=args.seed)
+        print('Seeded in {:.1f} s'.format(time.perf_counter() - start))
+
+    object_uuids = list(RiskModelObject.objects.filter(risk_model=risk_model).values_list('uuid', flat=True))
+    context = BenchmarkContext(risk_model, object_uuids, args.seed)
+    client = Client()
+
+    results = OrderedDict()
+    for name in args.scenario or SCENARIOS.keys():
+        results[name] = run_scenario(SCENARIOS[name], client, context, args.repeat)
+        print('{name:<24} median {median:9.2f} ms  {queries:>5} queries'.format(
+            name=name, median=results[name]['wall_ms']['median'], queries=results[name]['queries']))
+
+    report = OrderedDict([
+        ('meta', OrderedDict([
+            ('fields', len(context.risk_model_fields)),
+            ('objects', len(object_uuids)),
+            ('repeat', args.repeat),
+            ('python', platform.python_version()),
+            ('django', django.get_version()),
+            ('created', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+        ])),
+        ('results', results),
+    ])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), report, args.threshold)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
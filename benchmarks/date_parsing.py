@@ -0,0 +1,56 @@
+"""
+Compare validating 100,000 date values with dateutil and with `parse_date`
+
+    python -m benchmarks.date_parsing
+"""
+import datetime
+import os
+import timeit
+
+import django
+from dateutil.parser import parse
+
+
+def build_values(count=100000, distinct_days=3650):
+    start = datetime.date(2010, 1, 1)
+    return [(start + datetime.timedelta(days=i % distinct_days)).isoformat() for i in range(count)]
+
+
+def main(repeat=3):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+    django.setup()
+
+    from app.risk.dates import _dateutil_failures, _parse_iso_date_cached, parse_date
+
+    values = build_values()
+    assert [parse_date(value) for value in values] == [parse(value) for value in values]
+
+    def parse_date_uncached():
+        _parse_iso_date_cached.cache_clear()
+        _dateutil_failures.clear()
+        for value in values:
+            parse_date(value)
+            _parse_iso_date_cached.cache_clear()
+
+    scenarios = [
+        ('dateutil', lambda: [parse(value) for value in values]),
+        ('parse_date (no cache)', parse_date_uncached),
+        ('parse_date', lambda: [parse_date(value) for value in values]),
+        ('search miss, dateutil', lambda: [_try_parse(parse, 'Toyota') for _ in values]),
+        ('search miss, parse_date', lambda: [_try_parse(parse_date, 'Toyota') for _ in values]),
+    ]
+
+    for name, func in scenarios:
+        best = min(timeit.repeat(func, repeat=repeat, number=1))
+        print('{name:<25} {ms:9.2f} ms per {count} values'.format(name=name, ms=best * 1000, count=len(values)))
+
+
+def _try_parse(parse_func, value):
+    try:
+        return parse_func(value)
+    except ValueError:
+        return None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Generate realistic risk models and portfolios of objects of any size through the ORM
+"""
+import datetime
+import random
+
+from django.db import transaction
+
+from app.risk.models import RiskModel, RiskModelField, RiskModelObject, RiskModelObjectValue, FieldType
+
+
+FIELD_NAME_WORDS = [
+    'Insured', 'Building', 'Contents', 'Vehicle', 'Policy', 'Premium', 'Deductible', 'Sum', 'Occupancy',
+    'Construction', 'Roof', 'Year', 'Postcode', 'Region', 'Claims', 'Driver', 'Engine', 'Usage', 'Limit',
+]
+
+TEXT_VALUES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Taylor']
+
+ENUM_CHOICES = ['Low', 'Medium', 'High', 'Very High', 'Excluded']
+
+FIELD_TYPES = [FieldType.TEXT.value, FieldType.NUMBER.value, FieldType.DATE.value, FieldType.ENUM.value]
+
+
+def generate_risk_model(field_count, name='Benchmark Portfolio', seed=0):
+    """
+    Create a risk model with `field_count` fields, types are mixed evenly and every fifth field is required
+    """
+    rand = random.Random(seed)
+
+    risk_model = RiskModel.objects.create(name=name)
+    for index in range(field_count):
+        field_type = FIELD_TYPES[index % len(FIELD_TYPES)]
+        RiskModelField.objects.create(
+            risk_model=risk_model,
+            name='{} {} {}'.format(rand.choice(FIELD_NAME_WORDS), rand.choice(FIELD_NAME_WORDS), index + 1),
+            type=field_type,
+            is_required=index % 5 == 0,
+            choices=','.join(ENUM_CHOICES) if field_type == FieldType.ENUM.value else None)
+
+    return risk_model
+
+
+def generate_object_data(risk_model_fields, rand):
+    """
+    Return object data as it would be submitted to API, keyed by field's slug
+    """
+    data = {}
+    for field in risk_model_fields:
+        if field.type == FieldType.TEXT.value:
+            data[field.slug] = '{} {}'.format(rand.choice(TEXT_VALUES), rand.randint(1, 9999))
+        elif field.type == FieldType.NUMBER.value:
+            data[field.slug] = rand.randint(0, 1000000)
+        elif field.type == FieldType.DATE.value:
+            data[field.slug] = (datetime.date(2010, 1, 1) + datetime.timedelta(days=rand.randint(0, 3650))).isoformat()
+        elif field.type == FieldType.ENUM.value:
+            data[field.slug] = rand.choice(ENUM_CHOICES)
+    return data
+
+
+def generate_portfolio(risk_model, object_count, seed=0, chunk_size=1000):
+    """
+    Create `object_count` objects of `risk_model` with a value for every field
+    """
+    rand = random.Random(seed)
+    risk_model_fields = list(RiskModelField.objects.filter(risk_model=risk_model))
+
+    for start in range(0, object_count, chunk_size):
+        with transaction.atomic():
+            risk_objects = [RiskModelObject(risk_model=risk_model)
+                            for _ in range(min(chunk_size, object_count - start))]
+            RiskModelObject.objects.bulk_create(risk_objects)
+
+            object_ids = dict(RiskModelObject.objects.filter(
+                uuid__in=[risk_object.uuid for risk_object in risk_objects]).values_list('uuid', 'id'))
+
+            object_values = []
+            for risk_object in risk_objects:
+                data = generate_object_data(risk_model_fields, rand)
+                for field in risk_model_fields:
+                    value = data[field.slug]
+                    if field.type == FieldType.DATE.value:
+                        value = datetime.date(*map(int, value.split('-')))
+
+                    object_values.append(RiskModelObjectValue(
+                        risk_object_id=object_ids[risk_object.uuid],
+                        field=field,
+                        field_type=field.type,
+                        value=value))
+            RiskModelObjectValue.objects.bulk_create(object_values)
@@ -0,0 +1,165 @@
+"""
+Report what a cold start imports, from output of `python -X importtime`
+
+    python -m benchmarks.import_time --settings config.settings.api --output import_time.json
+    python -m benchmarks.import_time --settings config.settings.api --compare import_time.json
+
+Startup runs the same steps as the first request on Lambda: Django setup, WSGI application and
+URLconf. `-X importtime` needs Python 3.7 or newer, use `--python` to run startup with another
+interpreter. With `--compare`, exit status is 1 if total import time got slower than `--threshold`
+times previous report or new top-level packages are imported, so it can be tracked in CI.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+
+STARTUP_CODE = '''
+import django
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+'''
+
+# Settings of production profiles are read from environment, startup only needs them to exist
+DUMMY_ENVIRONMENT = {
+    'DJANGO_SECRET_KEY': 'import-time',
+    'DJANGO_AWS_ACCESS_KEY_ID': 'import-time',
+    'DJANGO_AWS_SECRET_ACCESS_KEY': 'import-time',
+    'DJANGO_AWS_STORAGE_BUCKET_NAME': 'import-time',
+}
+
+# `import time:       self [us] |     cumulative | imported package`
+IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_import_time(stderr):
+    """
+    Return list of `(module, self_us, cumulative_us, depth)` in the order they finished importing
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return modules
+
+
+def summarize(modules, top):
+    """
+    Total import time, and cumulative time of each top-level package (`django`, `dateutil`...)
+    """
+    packages = OrderedDict()
+    for module, self_us, cumulative_us, depth in modules:
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    return OrderedDict([
+        ('total_ms', round(sum(self_us for _, self_us, _, _ in modules) / 1000, 3)),
+        ('modules', len(modules)),
+        ('packages', OrderedDict(
+            (package, round(us / 1000, 3))
+            for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True))),
+        ('slowest', [
+            OrderedDict([('module', module), ('cumulative_ms', round(cumulative_us / 1000, 3))])
+            for module, _, cumulative_us, _ in sorted(modules, key=lambda item: item[2], reverse=True)[:top]]),
+    ])
+
+
+def run_startup(python, settings):
+    env = dict(os.environ)
+    for name, value in DUMMY_ENVIRONMENT.items():
+        env.setdefault(name, value)
+    env['DJANGO_SETTINGS_MODULE'] = settings
+
+    start = time.perf_counter()
+    process = subprocess.run(
+        [python, '-X', 'importtime', '-c', STARTUP_CODE], env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    if process.returncode != 0:
+        raise RuntimeError('Startup failed:\n{}'.format(process.stderr[-2000:]))
+
+    modules = parse_import_time(process.stderr)
+    if not modules:
+        raise RuntimeError('No `-X importtime` output, it needs Python 3.7 or newer (see --python)')
+
+    return modules, wall_ms
+
+
+def compare_reports(previous, current, threshold):
+    """
+    Print change of total import time and packages imported, return list of regressions
+    """
+    regressions = []
+
+    ratio = current['total_ms'] / max(previous['total_ms'], 0.001)
+    print('total import time {previous:.1f} -> {current:.1f} ms ({ratio:.2f}x)'.format(
+        previous=previous['total_ms'], current=current['total_ms'], ratio=ratio))
+    if ratio > threshold:
+        regressions.append('total import time')
+
+    new_packages = [package for package in current['packages'] if package not in previous['packages']]
+    for package in new_packages:
+        print('new package imported: {package} ({ms:.1f} ms)'.format(package=package, ms=current['packages'][package]))
+        regressions.append('package {}'.format(package))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--settings', default='config.settings.api', help='Settings module to start with')
+    parser.add_argument('--python', default=sys.executable, help='Python interpreter to run startup with')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of startups, the fastest one is reported')
+    parser.add_argument('--top', type=int, default=20, help='Number of slowest modules to list')
+    parser.add_argument('--output', help='Save report to this JSON file')
+    parser.add_argument('--compare', help='Compare with previous report JSON file')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown ratio of total import time reported as regression')
+    args = parser.parse_args(argv)
+
+    runs = [run_startup(args.python, args.settings) for _ in range(args.repeat)]
+    modules, wall_ms = min(runs, key=lambda run: sum(self_us for _, self_us, _, _ in run[0]))
+
+    report = summarize(modules, args.top)
+    report['wall_ms'] = round(min(wall_ms for _, wall_ms in runs), 3)
+    report['meta'] = OrderedDict([
+        ('settings', args.settings),
+        ('python', subprocess.check_output(
+            [args.python, '-c', 'import platform; print(platform.python_version())'],
+            universal_newlines=True).strip()),
+        ('host_python', platform.python_version()),
+        ('created', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+    ])
+
+    print('{settings}: {modules} modules imported in {total:.1f} ms, startup {wall:.1f} ms'.format(
+        settings=args.settings, modules=report['modules'], total=report['total_ms'], wall=report['wall_ms']))
+    for package, ms in list(report['packages'].items())[:args.top]:
+        print('  {package:<32} {ms:9.1f} ms'.format(package=package, ms=ms))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as compare_file:
+            regressions = compare_reports(json.load(compare_file), report, args.threshold)
+        if regressions:
+            print('Regressions: {}'.format(', '.join(regressions)))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Compare `ModelJSONEncoder` with the encoder it replaced on a page of 1,000 objects
+
+    python -m benchmarks.json_encoder
+"""
+import datetime
+import json
+import os
+import timeit
+import uuid
+
+import django
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.base import ModelBase
+
+
+class LegacyModelJSONEncoder(DjangoJSONEncoder):
+    def default(self, obj):
+        try:
+            iterable = iter(obj)
+        except TypeError:
+            pass
+        else:
+            return list(iterable)
+
+        if isinstance(obj.__class__, ModelBase):
+            return obj.to_dict()
+
+        return super().default(obj)
+
+
+def build_page(size=1000):
+    from django.utils import timezone
+
+    now = timezone.now()
+    return {
+        'count': size * 10,
+        'previous': None,
+        'next': 'http://localhost/api/models/{}/objects/?page=2'.format(uuid.uuid4()),
+        'results': [{
+            'uuid': uuid.uuid4(),
+            'created': now - datetime.timedelta(minutes=i),
+            'insured-name': 'Insured {}'.format(i),
+            'sum-insured': i * 1000,
+            'inception-date': datetime.date(2018, 1, 1) + datetime.timedelta(days=i % 365),
+            'occupancy': 'Residential',
+        } for i in range(size)],
+    }
+
+
+def main(repeat=5, number=20):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+    django.setup()
+
+    from app.api.json import ModelJSONEncoder, iterencode_chunked
+
+    page = build_page()
+
+    legacy_output = json.dumps(page, cls=LegacyModelJSONEncoder)
+    assert json.dumps(page, cls=ModelJSONEncoder) == legacy_output
+    assert ''.join(iterencode_chunked(page)) == legacy_output
+
+    scenarios = [
+        ('legacy encoder', lambda: json.dumps(page, cls=LegacyModelJSONEncoder)),
+        ('ModelJSONEncoder', lambda: json.dumps(page, cls=ModelJSONEncoder)),
+        ('iterencode_chunked', lambda: ''.join(iterencode_chunked(page))),
+    ]
+
+    for name, func in scenarios:
+        best = min(timeit.repeat(func, repeat=repeat, number=number)) / number
+        print('{name:<20} {ms:8.2f} ms per page'.format(name=name, ms=best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+"""
+Settings of `benchmarks.load` server: test settings with every request reaching the database
+"""
+from config.settings.test import *  # noqa
+
+
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
@@ -0,0 +1,235 @@
+"""
+Load test the WSGI and the ASGI application with the same number of threads, while slow clients
+download exports of a large risk model
+
+    python -m benchmarks.slow_clients --threads 4 --slow-clients 16 --duration 20
+
+Slow clients read the export a few KB at a time. A WSGI thread is busy until its client has read
+the whole response, so they soon take every thread and fast requests (model detail) wait. The
+ASGI application hands responses over to its event loop, so fast requests keep their latency.
+p50/p99 latency, throughput and timeouts of fast requests, and exports completed, are printed for each
+server and can be saved with `--output`.
+
+The ASGI application is served by a minimal asyncio HTTP/1.1 server, so no ASGI server package is
+needed, use e.g. `uvicorn config.asgi:application` in production.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from benchmarks.load import SETTINGS_MODULE, _free_port
+
+
+def serve_asgi(port, threads, streams):
+    import django
+    django.setup(set_prefix=False)
+
+    from app.api.asgi import ASGIHandler
+
+    application = ASGIHandler(threads, streams)
+
+    async def handle_connection(reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, http_version = request_line.decode('latin-1').split()
+
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+
+            content_length = int(dict(headers).get(b'content-length', 0))
+            body = await reader.readexactly(content_length) if content_length else b''
+
+            path, _, query_string = target.partition('?')
+            scope = {
+                'type': 'http',
+                'http_version': http_version.split('/')[-1],
+                'method': method,
+                'scheme': 'http',
+                'path': unquote(path),
+                'query_string': query_string.encode('latin-1'),
+                'headers': headers,
+                'server': ('127.0.0.1', port),
+                'client': writer.get_extra_info('peername'),
+            }
+
+            request_messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+            async def receive():
+                return request_messages.pop(0) if request_messages else {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    # Body ends when connection is closed
+                    writer.write('HTTP/1.1 {} OK\r\n'.format(message['status']).encode('latin-1') + b''.join(
+                        name + b': ' + value + b'\r\n' for name, value in message['headers']
+                        if name.lower() != b'connection') + b'Connection: close\r\n\r\n')
+                else:
+                    writer.write(message.get('body', b''))
+                    await writer.drain()
+
+            await application(scope, receive, send)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.start_server(handle_connection, '127.0.0.1', port, backlog=1024))
+    print('ready', flush=True)
+    loop.run_forever()
+
+
+def slow_download(port, path, read_size, delay):
+    """
+    Download `path` reading `read_size` bytes every `delay` seconds, return number of bytes
+    """
+    with socket.socket() as sock:
+        # Small receive window, so server can't push the whole response into socket buffers at once
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, read_size)
+        sock.connect(('127.0.0.1', port))
+        sock.sendall('GET {} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.format(path).encode())
+
+        size = 0
+        while True:
+            data = sock.recv(read_size)
+            if not data:
+                return size
+            size += len(data)
+            time.sleep(delay)
+
+
+def run_load(port, model_uuid, args):
+    deadline = time.monotonic() + args.duration
+    latencies = []
+    timeouts = []
+    downloads = []
+    lock = threading.Lock()
+
+    detail_url = 'http://127.0.0.1:{port}/api/models/{uuid}/'.format(port=port, uuid=model_uuid)
+    export_path = '/api/models/{uuid}/objects/export/'.format(uuid=model_uuid)
+
+    def fast_client(_):
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(detail_url, timeout=args.timeout) as response:
+                    response.read()
+            except (socket.timeout, urllib.error.URLError):
+                with lock:
+                    timeouts.append(start)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    def slow_client(_):
+        while time.monotonic() < deadline:
+            size = slow_download(port, export_path, args.read_size, args.read_delay)
+            with lock:
+                downloads.append(size)
+
+    with ThreadPoolExecutor(args.slow_clients) as slow_executor:
+        slow_futures = [slow_executor.submit(slow_client, index) for index in range(args.slow_clients)]
+        # Let slow clients take their threads first
+        time.sleep(1)
+        with ThreadPoolExecutor(args.fast_clients) as fast_executor:
+            list(fast_executor.map(fast_client, range(args.fast_clients)))
+        for future in slow_futures:
+            future.result()
+
+    latencies.sort()
+    return OrderedDict([
+        ('fast_requests', len(latencies)),
+        ('fast_per_second', round(len(latencies) / args.duration, 1)),
+        ('fast_p50_ms', round(statistics.median(latencies), 3) if latencies else None),
+        ('fast_p99_ms', round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3)
+         if latencies else None),
+        ('fast_timeouts', len(timeouts)),
+        ('exports', len(downloads)),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objects', type=int, default=5000, help='Number of objects exported')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds fast clients run for')
+    parser.add_argument('--threads', type=int, default=4, help='Number of threads of each server')
+    parser.add_argument('--streams', type=int, default=64, help='ASGI_STREAMS of ASGI server')
+    parser.add_argument('--slow-clients', type=int, default=16)
+    parser.add_argument('--fast-clients', type=int, default=4)
+    parser.add_argument('--read-size', type=int, default=4096, help='Bytes read by a slow client at once')
+    parser.add_argument('--read-delay', type=float, default=0.01, help='Seconds a slow client waits between reads')
+    parser.add_argument('--timeout', type=float, default=5, help='Seconds a fast request may take')
+    parser.add_argument('--output', help='Save results to this JSON file')
+    parser.add_argument('--serve-asgi', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve_asgi:
+        return serve_asgi(args.serve_asgi, args.threads, args.streams)
+
+    from benchmarks.sqlite_load import seed
+
+    work_dir = tempfile.mkdtemp(prefix='risk_model_slow_clients')
+    try:
+        database_path = os.path.join(work_dir, 'slow_clients.db')
+        model_uuid, _ = seed(database_path, args.objects)
+
+        env = dict(os.environ, DATABASE_URL='sqlite:///{}'.format(database_path),
+                   DJANGO_SETTINGS_MODULE=SETTINGS_MODULE, REQUEST_TIMING_SAMPLE_RATE='0')
+
+        results = OrderedDict()
+        for name, module, serve_option in (('wsgi', 'benchmarks.load', ['--concurrency']),
+                                           ('asgi', 'benchmarks.slow_clients', ['--threads'])):
+            port = _free_port()
+            command = [sys.executable, '-m', module, '--serve' if name == 'wsgi' else '--serve-asgi', str(port)]
+            command += serve_option + [str(args.threads)]
+            if name == 'asgi':
+                command += ['--streams', str(args.streams)]
+
+            server = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, universal_newlines=True)
+            try:
+                server.stdout.readline()
+                results[name] = result = run_load(port, model_uuid, args)
+            finally:
+                server.terminate()
+                server.wait()
+
+            print('{name}  fast {per_second:8.1f} req/s  p50 {p50} ms  p99 {p99} ms  {timeouts} timeouts  {exports} exports'.format(
+                name=name, per_second=result['fast_per_second'], p50=result['fast_p50_ms'],
+                p99=result['fast_p99_ms'], timeouts=result['fast_timeouts'], exports=result['exports']))
+    finally:
+        shutil.rmtree(work_dir)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(OrderedDict([
+                ('objects', args.objects),
+                ('threads', args.threads),
+                ('slow_clients', args.slow_clients),
+                ('fast_clients', args.fast_clients),
+                ('results', results),
+            ]), output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
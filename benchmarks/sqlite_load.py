@@ -0,0 +1,197 @@
+"""
+Load test SQLite with concurrent readers and writers, with default pragmas and with `SQLITE_PRAGMAS`
+
+    python -m benchmarks.sqlite_load --duration 20 --processes 4 --clients 16 --write-ratio 0.2
+
+Like gunicorn workers, several server processes (each with a pool of threads) share one SQLite
+file. Clients list objects and create objects of a seeded risk model for `--duration` seconds.
+Each run gets its own copy of the seeded database, first with SQLite defaults (rollback journal,
+`synchronous=FULL`), then with pragmas of settings. Throughput, p50/p99 latency and failed
+requests ("database is locked") of each run are printed and can be saved with `--output`.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.load import SETTINGS_MODULE, _free_port
+
+
+# SQLite defaults, to compare pragmas of settings with
+DEFAULT_PRAGMAS = OrderedDict([
+    ('SQLITE_JOURNAL_MODE', 'DELETE'),
+    ('SQLITE_SYNCHRONOUS', 'FULL'),
+    ('SQLITE_CACHE_SIZE', '-2000'),
+    ('SQLITE_MMAP_SIZE', '0'),
+    ('SQLITE_TEMP_STORE', 'DEFAULT'),
+])
+
+
+def seed(database_path, objects):
+    """
+    Create database tables, a risk model with a portfolio of objects, return uuid of the model and
+    data of a few objects to create during load test
+    """
+    import django
+    os.environ['DATABASE_URL'] = 'sqlite:///{}'.format(database_path)
+    os.environ['DJANGO_SETTINGS_MODULE'] = SETTINGS_MODULE
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from app.risk.models import RiskModelField
+    from benchmarks.fixtures import generate_object_data, generate_portfolio, generate_risk_model
+
+    call_command('migrate', verbosity=0)
+    risk_model = generate_risk_model(20)
+    generate_portfolio(risk_model, objects)
+
+    risk_model_fields = list(RiskModelField.objects.filter(risk_model=risk_model))
+    rand = random.Random(0)
+    object_data = [generate_object_data(risk_model_fields, rand) for _ in range(100)]
+
+    # Closing last connection moves WAL content into database file, so it can be copied
+    connection.close()
+    return risk_model.uuid, object_data
+
+
+def _request(url, data=None):
+    if data is not None:
+        request = urllib.request.Request(
+            url, data=json.dumps(data).encode(), headers={'Content-Type': 'application/json'}, method='POST')
+    else:
+        request = urllib.request.Request(url)
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        ok = True
+    except urllib.error.HTTPError:
+        ok = False
+    return ok, (time.perf_counter() - start) * 1000
+
+
+def run_load(base_urls, model_uuid, object_data, clients, duration, write_ratio):
+    deadline = time.monotonic() + duration
+    results = {'read': [], 'write': []}
+    failures = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def client(index):
+        rand = random.Random(index)
+        base_url = base_urls[index % len(base_urls)]
+        list_url = '{base}/api/models/{uuid}/objects/?limit=20&count=0'.format(base=base_url, uuid=model_uuid)
+
+        while time.monotonic() < deadline:
+            if rand.random() < write_ratio:
+                kind, (ok, latency) = 'write', _request(list_url, rand.choice(object_data))
+            else:
+                kind, (ok, latency) = 'read', _request(list_url)
+            with lock:
+                results[kind].append(latency)
+                if not ok:
+                    failures[kind] += 1
+
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(client, range(clients)))
+
+    report = OrderedDict()
+    for kind in ('read', 'write'):
+        latencies = sorted(results[kind])
+        if not latencies:
+            continue
+        report[kind] = OrderedDict([
+            ('requests', len(latencies)),
+            ('per_second', round(len(latencies) / duration, 1)),
+            ('failed', failures[kind]),
+            ('p50_ms', round(statistics.median(latencies), 3)),
+            ('p99_ms', round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3)),
+        ])
+    return report
+
+
+def run(name, database_path, pragmas_env, args, model_uuid, object_data):
+    env = dict(os.environ, DATABASE_URL='sqlite:///{}'.format(database_path),
+               DJANGO_SETTINGS_MODULE=SETTINGS_MODULE, REQUEST_TIMING_SAMPLE_RATE='0', **pragmas_env)
+
+    servers = []
+    try:
+        for _ in range(args.processes):
+            port = _free_port()
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.load', '--serve', str(port), '--concurrency', str(args.threads)],
+                env=env, stdout=subprocess.PIPE, universal_newlines=True)
+            servers.append((server, 'http://127.0.0.1:{}'.format(port)))
+        for server, _ in servers:
+            server.stdout.readline()
+
+        result = run_load([base_url for _, base_url in servers], model_uuid, object_data,
+                          args.clients, args.duration, args.write_ratio)
+    finally:
+        for server, _ in servers:
+            server.terminate()
+            server.wait()
+
+    for kind, stats in result.items():
+        print('{name:<9} {kind:<5} {per_second:8.1f} req/s  p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  '
+              '{failed} failed'.format(name=name, kind=kind, per_second=stats['per_second'],
+                                       p50=stats['p50_ms'], p99=stats['p99_ms'], failed=stats['failed']))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objects', type=int, default=10000, help='Number of objects seeded')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds each run lasts')
+    parser.add_argument('--processes', type=int, default=4, help='Number of server processes')
+    parser.add_argument('--threads', type=int, default=4, help='Number of threads of each server process')
+    parser.add_argument('--clients', type=int, default=16, help='Number of concurrent clients')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of requests creating an object')
+    parser.add_argument('--output', help='Save results to this JSON file')
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='risk_model_sqlite_load')
+    try:
+        seed_path = os.path.join(work_dir, 'seed.db')
+        model_uuid, object_data = seed(seed_path, args.objects)
+
+        results = OrderedDict()
+        for name, pragmas_env, journal_mode in (('defaults', DEFAULT_PRAGMAS, 'DELETE'), ('tuned', {}, 'WAL')):
+            database_path = os.path.join(work_dir, '{}.db'.format(name))
+            shutil.copy(seed_path, database_path)
+            # Journal mode is kept in database file, set it before servers connect concurrently
+            sqlite_connection = sqlite3.connect(database_path)
+            sqlite_connection.execute('PRAGMA journal_mode = {}'.format(journal_mode))
+            sqlite_connection.close()
+            results[name] = run(name, database_path, pragmas_env, args, model_uuid, object_data)
+    finally:
+        shutil.rmtree(work_dir)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(OrderedDict([
+                ('objects', args.objects),
+                ('duration', args.duration),
+                ('processes', args.processes),
+                ('threads', args.threads),
+                ('clients', args.clients),
+                ('write_ratio', args.write_ratio),
+                ('results', results),
+            ]), output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
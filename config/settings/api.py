@@ -0,0 +1,47 @@
+"""
+Settings of Lambda function serving only `/api/`. Admin, sessions, messages, static files and
+front-end asset apps are left out, so a cold start imports and sets up much less before the first
+request can be served.
+"""
+from .production import *  # noqa
+
+
+# APP CONFIGURATION
+# ------------------------------------------------------------------------------
+API_EXCLUDED_APPS = (
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'collectfast',
+    'storages',
+    'webpack_loader',
+)
+
+INSTALLED_APPS = tuple(app for app in INSTALLED_APPS if app not in API_EXCLUDED_APPS)
+
+
+# MIDDLEWARE CONFIGURATION
+# ------------------------------------------------------------------------------
+MIDDLEWARE = [
+    'app.api.middleware.RequestTimingMiddleware',
+    'app.api.middleware.ConnectionHealthCheckMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+
+# TEMPLATE CONFIGURATION
+# ------------------------------------------------------------------------------
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    'django.template.context_processors.debug',
+    'django.template.context_processors.request',
+    'django.template.context_processors.tz',
+]
+
+
+# URL Configuration
+# ----------------------------------------------------------------------------
+ROOT_URLCONF = 'config.urls_api'
@@ -34,6 +34,8 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 # MIDDLEWARE CONFIGURATION
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    'app.api.middleware.RequestTimingMiddleware',
+    'app.api.middleware.ConnectionHealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,6 +45,10 @@ MIDDLEWARE = [
 ]
 
 
+# Share of requests (0 to 1) measured by RequestTimingMiddleware
+REQUEST_TIMING_SAMPLE_RATE = env.float('REQUEST_TIMING_SAMPLE_RATE', default=1.0)
+
+
 # DEBUG
 # ------------------------------------------------------------------------------
 DEBUG = env.bool('DJANGO_DEBUG', False)
@@ -78,6 +84,58 @@ DATABASES = {
 }
 DATABASES['default']['ATOMIC_REQUESTS'] = True
 
+# Keep connection open between requests for this many seconds (0 closes it after every request)
+DATABASES['default']['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=0)
+
+# Check a kept connection still works before a request uses it, see `ConnectionHealthCheckMiddleware`
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('CONN_HEALTH_CHECKS', default=False)
+
+# Pool of PostgreSQL connections shared by threads of a process, needs `django-postgrespool2`.
+# Connections are returned to the pool after each request, so leave `CONN_MAX_AGE` at 0.
+DATABASE_POOL_SIZE = env.int('DATABASE_POOL_SIZE', default=0)
+if DATABASE_POOL_SIZE and DATABASES['default']['ENGINE'] in (
+        'django.db.backends.postgresql', 'django.db.backends.postgresql_psycopg2'):
+    DATABASES['default']['ENGINE'] = 'django_postgrespool2'
+    DATABASE_POOL_ARGS = {
+        'pool_size': DATABASE_POOL_SIZE,
+        'max_overflow': env.int('DATABASE_POOL_MAX_OVERFLOW', default=10),
+        'recycle': env.int('DATABASE_POOL_RECYCLE', default=300),
+    }
+
+# Pragmas run on every new SQLite connection, ignored by other databases (see `app.api.db`).
+# In WAL mode readers keep going while a writer commits, instead of every writer locking out all
+# readers, and `NORMAL` sync is safe with WAL (a power loss may only drop last commits).
+# `busy_timeout` (ms) is first, so changing journal mode waits for a locked database too.
+SQLITE_PRAGMAS = {
+    'busy_timeout': env.int('SQLITE_BUSY_TIMEOUT', default=5000),
+    'journal_mode': env.str('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': env.str('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    # Negative size is in KiB
+    'cache_size': env.int('SQLITE_CACHE_SIZE', default=-20000),
+    'mmap_size': env.int('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024),
+    'temp_store': env.str('SQLITE_TEMP_STORE', default='MEMORY'),
+}
+
+# Run `PRAGMA optimize` on SQLite connections still open when process exits
+SQLITE_OPTIMIZE_ON_EXIT = env.bool('SQLITE_OPTIMIZE_ON_EXIT', default=True)
+
+
+# CACHING
+# ------------------------------------------------------------------------------
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Cache used for API responses, and how long (in seconds) a response can be kept
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = env.int('API_CACHE_TIMEOUT', default=300)
+
+
+# RISK OBJECTS
+# ------------------------------------------------------------------------------
+# Keep values of each object in one flattened row, and read objects from it
+RISK_OBJECT_PROJECTION = env.bool('RISK_OBJECT_PROJECTION', default=False)
+
 
 # GENERAL CONFIGURATION
 # ------------------------------------------------------------------------------
@@ -145,6 +203,11 @@ ROOT_URLCONF = 'config.urls'
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# `config.asgi.application`: threads handling requests (and their database queries), and number of
+# streaming responses sent at once, each one with a thread of its own
+ASGI_THREADS = env.int('ASGI_THREADS', default=8)
+ASGI_STREAMS = env.int('ASGI_STREAMS', default=32)
+
 ADMIN_URL = 'admin/'
 
 
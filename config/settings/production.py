@@ -45,10 +45,7 @@ AWS_HEADERS = {
 # stored files.
 
 #  See:http://stackoverflow.com/questions/10390244/
-from storages.backends.s3boto3 import S3Boto3Storage
-StaticRootS3BotoStorage = lambda: S3Boto3Storage(location='static')  # noqa
-MediaRootS3BotoStorage = lambda: S3Boto3Storage(location='media', file_overwrite=False)  # noqa
-DEFAULT_FILE_STORAGE = 'config.settings.production.MediaRootS3BotoStorage'
+DEFAULT_FILE_STORAGE = 'config.storage_backends.MediaRootS3BotoStorage'
 
 MEDIA_URL = 'https://s3.amazonaws.com/%s/media/' % AWS_STORAGE_BUCKET_NAME
 
@@ -56,7 +53,7 @@ MEDIA_URL = 'https://s3.amazonaws.com/%s/media/' % AWS_STORAGE_BUCKET_NAME
 # ------------------------
 
 STATIC_URL = 'https://s3.amazonaws.com/%s/static/' % AWS_STORAGE_BUCKET_NAME
-STATICFILES_STORAGE = 'config.settings.production.StaticRootS3BotoStorage'
+STATICFILES_STORAGE = 'config.storage_backends.StaticRootS3BotoStorage'
 
 # See: https://github.com/antonagestam/collectfast
 # For Django 1.7+, 'collectfast' should come before
@@ -98,11 +95,21 @@ DATABASES = {
         'NAME': 'production.db',
         'BUCKET': 'riskmodel-sqlite',
         'ATOMIC_REQUESTS': True,
-        'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=60)
+        'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('CONN_HEALTH_CHECKS', default=False),
     }
 }
 
 
+# CACHING
+# ------------------------------------------------------------------------------
+# Server processes don't share a local memory cache, each one would keep serving responses that
+# another one has outdated. Responses are only cached when `CACHE_URL` is a shared backend.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dummycache://'),
+}
+
+
 # LOGGING CONFIGURATION
 # ------------------------------------------------------------------------------
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#logging
@@ -147,6 +154,11 @@ LOGGING = {
             'level': 'ERROR',
             'handlers': ['console', 'mail_admins'],
             'propagate': True
+        },
+        'app.api.timing': {
+            'level': 'INFO',
+            'handlers': ['console'],
+            'propagate': False
         }
     }
 }
@@ -155,6 +167,9 @@ LOGGING = {
 # CUSTOM CONFIGURATION
 # ------------------------------------------------------------------------------
 
+# Requests are only timed, logged and given a `Server-Timing` header when opted in, e.g. 0.01
+REQUEST_TIMING_SAMPLE_RATE = env.float('REQUEST_TIMING_SAMPLE_RATE', default=0)
+
 
 # ------------------------------------------------------------------------------
 
@@ -0,0 +1,14 @@
+"""
+S3 storages used by production settings. storages and boto3 are imported when a storage is first
+used rather than when settings are loaded, which is most of the time never in API requests.
+"""
+
+
+def StaticRootS3BotoStorage():
+    from storages.backends.s3boto3 import S3Boto3Storage
+    return S3Boto3Storage(location='static')
+
+
+def MediaRootS3BotoStorage():
+    from storages.backends.s3boto3 import S3Boto3Storage
+    return S3Boto3Storage(location='media', file_overwrite=False)
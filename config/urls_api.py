@@ -0,0 +1,11 @@
+"""
+URLconf of API-only settings (`config.settings.api`). It only imports API views, and nothing in
+them touches database until a request comes in.
+"""
+from django.urls import path
+from django.conf.urls import include
+
+
+urlpatterns = [
+    path('api/', include('app.risk.api.urls', namespace='risk_api')),
+]